@@ -0,0 +1,115 @@
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+CACHE_NAME = "analysis_cache.db"
+COMMIT_EVERY = 500
+
+class AnalysisCache:
+    # Remembers analysis results of source files across runs, keyed by absolute path.
+    # A row is only trusted while the file still has the same size, mtime and inode,
+    # and was analysed by the same tool with the same context (INF URL, target name).
+
+    def __init__(self, db_path, invalidate=False):
+        db_path = os.path.abspath(str(db_path))
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "path TEXT, kind TEXT, size INTEGER, mtime_ns INTEGER, inode INTEGER, "
+            "context TEXT, payload TEXT, PRIMARY KEY (path, kind))"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            "sha1 TEXT, kind TEXT, verdict TEXT, PRIMARY KEY (sha1, kind))"
+        )
+        if invalidate:
+            self.conn.execute("DELETE FROM results")
+            self.conn.execute("DELETE FROM verdicts")
+        self.conn.commit()
+        self.pending = 0
+
+    def _key(self, path):
+        return os.path.normcase(os.path.abspath(str(path)))
+
+    def lookup(self, path, kind, context=""):
+        try:
+            st = os.stat(str(path))
+        except OSError:
+            return None
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, inode, context, payload FROM results WHERE path = ? AND kind = ?",
+            (self._key(path), kind)
+        ).fetchone()
+        if row is None or tuple(row[:4]) != (st.st_size, st.st_mtime_ns, st.st_ino, context):
+            return None
+        return json.loads(row[4])
+
+    def store(self, path, kind, payload, context=""):
+        try:
+            st = os.stat(str(path))
+        except OSError:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results (path, kind, size, mtime_ns, inode, context, payload) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self._key(path), kind, st.st_size, st.st_mtime_ns, st.st_ino, context, json.dumps(payload))
+        )
+        self.changed()
+
+    def changed(self):
+        self.pending += 1
+        if self.pending >= COMMIT_EVERY:
+            self.conn.commit()
+            self.pending = 0
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+class VerdictMemo:
+    # Corruption verdicts (image, video error lines, XML) keyed by content
+    # SHA1, so byte-identical copies in other caches are only probed once. Backed by an
+    # AnalysisCache the verdicts also survive the run. Pool workers pass a read-only
+    # db_path instead: they see stored verdicts, and new ones are only collected for
+    # drain() so the parent can store them.
+
+    def __init__(self, cache=None, db_path=None):
+        self.memo = {}
+        self.new = {}
+        self.cache = cache
+        self.conn = cache.conn if cache is not None else None
+        if self.conn is None and db_path is not None and os.path.exists(str(db_path)):
+            self.conn = sqlite3.connect(f"{Path(os.path.abspath(str(db_path))).as_uri()}?mode=ro", uri=True, timeout=30)
+
+    def get(self, sha1, kind):
+        key = (sha1, kind)
+        if key in self.memo:
+            return self.memo[key]
+        if self.conn is not None:
+            row = self.conn.execute(
+                "SELECT verdict FROM verdicts WHERE sha1 = ? AND kind = ?", key
+            ).fetchone()
+            if row is not None:
+                self.memo[key] = json.loads(row[0])
+                return self.memo[key]
+        return None
+
+    def put(self, sha1, kind, verdict):
+        key = (sha1, kind)
+        if key in self.memo:
+            return
+        self.memo[key] = verdict
+        if self.cache is None:
+            self.new[key] = verdict
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO verdicts (sha1, kind, verdict) VALUES (?, ?, ?)",
+            (sha1, kind, json.dumps(verdict))
+        )
+        self.cache.changed()
+
+    def drain(self):
+        new, self.new = self.new, {}
+        return new
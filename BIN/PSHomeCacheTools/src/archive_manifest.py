@@ -0,0 +1,65 @@
+import os
+import sqlite3
+
+MANIFEST_NAME = "manifest.db"
+COMMIT_EVERY = 500
+
+class ArchiveManifest:
+    # Remembers size, mtime and SHA1 of archived files, keyed by path relative to ARCHIVE/.
+    # An entry is only trusted while the file on disk still has the same size and mtime.
+
+    def __init__(self, archive_dir):
+        self.archive_dir = os.path.abspath(str(archive_dir))
+        os.makedirs(self.archive_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(self.archive_dir, MANIFEST_NAME))
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "relpath TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha1 TEXT)"
+        )
+        self.pending = 0
+
+    def _key(self, path):
+        return os.path.normcase(os.path.relpath(os.path.abspath(str(path)), self.archive_dir))
+
+    def _changed(self):
+        self.pending += 1
+        if self.pending >= COMMIT_EVERY:
+            self.conn.commit()
+            self.pending = 0
+
+    def lookup(self, path):
+        try:
+            st = os.stat(str(path))
+        except OSError:
+            return None
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, sha1 FROM files WHERE relpath = ?", (self._key(path),)
+        ).fetchone()
+        if row is None or row[0] != st.st_size or row[1] != st.st_mtime_ns:
+            return None
+        return {'size': row[0], 'sha1': row[2]}
+
+    def record(self, path, sha1):
+        try:
+            st = os.stat(str(path))
+        except OSError:
+            st = None
+        if st is None or not sha1 or sha1 == "ERROR":
+            self.conn.execute("DELETE FROM files WHERE relpath = ?", (self._key(path),))
+            self._changed()
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files (relpath, size, mtime_ns, sha1) VALUES (?, ?, ?, ?)",
+            (self._key(path), st.st_size, st.st_mtime_ns, sha1)
+        )
+        self._changed()
+
+    def rename(self, old_path, new_path):
+        new_key = self._key(new_path)
+        self.conn.execute("DELETE FROM files WHERE relpath = ?", (new_key,))
+        self.conn.execute("UPDATE files SET relpath = ? WHERE relpath = ?", (new_key, self._key(old_path)))
+        self._changed()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
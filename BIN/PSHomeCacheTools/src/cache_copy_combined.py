@@ -1,30 +1,53 @@
 import os
-import shutil
-import subprocess
 import sys
-import hashlib
 import logging
-import re
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from PIL import Image, UnidentifiedImageError
+from dat_index import build_dat_index, find_dat_files
+from archive_manifest import ArchiveManifest
+from video_probe import TIMEOUT_VERDICT, VIDEO_PROBE_MODES, default_video_timeout, probe_video
+from image_check import is_image_corrupt
+from xml_check import is_xml_corrupt
+from file_probe import FileProbe
+from file_fingerprint import partial_fingerprint
+from analysis_cache import AnalysisCache, VerdictMemo, CACHE_NAME as ANALYSIS_CACHE_NAME
+from run_logs import RunLogWriter
+from file_placement import LINK_MODES, place_file
+from dir_snapshot import DirSnapshot
 
 DEBUG_ENABLED = False
 VERBOSE_MODE = False
 CUSTOM_QUERY_MODE = False
 OVERRIDE_LOG_PATH = None
 OVERRIDE_NEW_MODE = False
-OVERRIDE_NEW_LOG = None 
 any_processed = False
 started_processing = False
 exceptions_modified_file = None
 exceptions_corrupt_file = None
+cachelist_file = None
 OVERRIDE_MODE = "0"
+LINK_MODE = "copy"
+VIDEO_PROBE_MODE = "full"
+VIDEO_TIMEOUT = None
+IMAGE_CHECK_MODE = "fast"
+JOBS = 1
 copied_count = 0
 corrupt_count = 0
 modified_count = 0
 dupe_count = 0
 multiple_matched_dat_files = 0
+ARCHIVE_MANIFEST = None
+ANALYSIS_CACHE = None
+VERDICT_MEMO = None
+REANALYZE = False
+RUN_LOGS = RunLogWriter()
+ARCHIVE_SNAPSHOT = DirSnapshot()
+# Archive targets are only ever compared by content and size
+TARGET_FIELDS = {'sha1', 'size'}
 
 FOLDER_RENAMES = {
     "scee": "scee-home.playstation.net",
@@ -59,60 +82,6 @@ def get_file_extension(file_path):
     _, file_extension = os.path.splitext(file_path)
     return file_extension
 
-def get_file_size(file_path):
-    try:
-        return os.path.getsize(file_path)
-    except Exception as e:
-        dbg("Error getting file size: %s", e)
-        return -1
-
-def get_sdata_version(file_path, file_size):
-    if not file_path.lower().endswith('.sdat'):
-        return "NA"
-
-    if file_size < 16:
-        return "0"
-
-    version_signatures = {
-        b"SDATA 4.0.0.W\x00\x00\x00": "4.0",
-        b"SDATA 2.4.0.W\x00\x00\x00": "2.4",
-        b"SDATA 2.2.0.W\x00\x00\x00": "2.2",
-        b"SDATA 3.3.0.W\x00\x00\x00": "3.3",
-    }
-
-    try:
-        with open(file_path, 'rb') as file:
-            file.seek(-16, 2)
-            end_bytes = file.read(16)
-            for signature, version in version_signatures.items():
-                if end_bytes == signature:
-                    return version
-            return "0"
-    except Exception as e:
-        dbg("Error checking SDATA version: %s", e)
-        return "ERROR"
-
-def calculate_sha1(file_path):
-    try:
-        sha1 = hashlib.sha1()
-        with open(file_path, 'rb') as f:
-            while chunk := f.read(65536):
-                sha1.update(chunk)
-        return sha1.hexdigest().upper()
-    except Exception as e:
-        dbg("Error calculating SHA1: %s", e)
-        return "ERROR"
-
-def is_image_corrupt(filepath):
-    try:
-        with Image.open(filepath) as img:
-            img.verify()
-        with Image.open(filepath) as img:
-            img.load()
-    except (IOError, SyntaxError, UnidentifiedImageError, ValueError, AttributeError):
-        return 1
-    return 0
-
 SPECIFIC_ERRORS = [
     "moov atom not found",
     "contradictory STSC and STCO",
@@ -127,8 +96,15 @@ SPECIFIC_ERRORS = [
     "partial file"
 ]
 
+# While a source file is analysed its video log lines are collected here instead of
+# being logged, so they can be cached and written in INF order
+_captured_video_log = None
+
 def log_and_print(message, log_only=True):
-    logging.info(message)
+    if _captured_video_log is not None:
+        _captured_video_log.append(message)
+    else:
+        logging.info(message)
 
 def extract_error_summary(output):
     detailed_lines = []
@@ -139,28 +115,54 @@ def extract_error_summary(output):
                     detailed_lines.append(line)
     return detailed_lines
 
-def analyze_video(file_path, ffprobe_path, log_path=None, inf_url=None):
+INPUT_MARKER = "\x00input\x00"
+
+def memoized_verdict(sha1, kind, compute):
+    if VERDICT_MEMO is None or not sha1 or sha1 == "ERROR":
+        return compute()
+    verdict = VERDICT_MEMO.get(sha1, kind)
+    if verdict is None:
+        verdict = compute()
+        if verdict is not None:
+            VERDICT_MEMO.put(sha1, kind, verdict)
+    return verdict
+
+def setup_video_log(log_path):
+    logger = logging.getLogger()
+    if not logger.hasHandlers():
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        logging.basicConfig(filename=log_path, level=logging.INFO, format='%(message)s')
+
+def analyze_video(file_path, ffprobe_path, log_path=None, inf_url=None, sha1=None):
     def log_if_corrupt(detailed_lines, log_path):
         if not detailed_lines or not log_path:
             return False
-        logger = logging.getLogger()
-        if not logger.hasHandlers():
-            os.makedirs(os.path.dirname(log_path), exist_ok=True)
-            logging.basicConfig(filename=log_path, level=logging.INFO, format='%(message)s')
+        setup_video_log(log_path)
         return True
 
-    cmd = [
-        ffprobe_path,
-        '-v', 'error',
-        '-show_entries', 'format',
-        '-show_entries', 'stream',
-        '-show_entries', 'frame',
-        '-print_format', 'json',
-        file_path
-    ]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    detailed_lines = extract_error_summary(result.stderr)
+    def probe():
+        stderr = probe_video(file_path, ffprobe_path, VIDEO_PROBE_MODE, VIDEO_TIMEOUT)
+        if stderr is None:
+            return None
+        # ffprobe names its input in the messages, keep them valid for every identical copy
+        return [line.replace(file_path, INPUT_MARKER) for line in extract_error_summary(stderr)]
+
+    # The error lines are memoised, the log entry itself is still written per file
+    kind = 'video' if VIDEO_PROBE_MODE == "full" else f"video-{VIDEO_PROBE_MODE}"
+    detailed_lines = memoized_verdict(sha1, kind, probe)
+
+    if detailed_lines is None:
+        dbg("ffprobe timed out after %ss on %s", VIDEO_TIMEOUT, file_path)
+        if log_path:
+            setup_video_log(log_path)
+            if inf_url:
+                log_and_print(f"{inf_url}")
+            log_and_print(f"{os.path.relpath(file_path, os.getcwd())}:")
+            log_and_print(f"ffprobe timed out after {VIDEO_TIMEOUT}s")
+            log_and_print("-----------------------------------------------")
+        return TIMEOUT_VERDICT
 
+    detailed_lines = [line.replace(INPUT_MARKER, file_path) for line in detailed_lines]
     if detailed_lines:
         relative_path = os.path.relpath(file_path, os.getcwd())
         if log_if_corrupt(detailed_lines, log_path):
@@ -183,80 +185,57 @@ XML_ENCRYPTED = {
 }
 
 
-ROOT_TAGS = [
-    "commerce_point", "XML", "xml", "REGIONINFO", "rss", "RSS", "LOCALISATION",
-    "eula", "active_objects", "videos", "media", "WEATHER", "TICKER"
-]
-
-XML_PATTERNS = {
-    tag.lower(): (
-        re.compile(rf"<\s*{tag.lower()}\b[^>]*\/\s*>", re.IGNORECASE),  # self-closing
-        re.compile(rf"<\s*{tag.lower()}\b[^>]*>", re.IGNORECASE),       # open
-        re.compile(rf"</\s*{tag.lower()}\s*>", re.IGNORECASE),          # close
-    )
-    for tag in ROOT_TAGS
-}
-
-def is_xml_corrupt(filepath):
-    try:
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            content_lower = f.read().lower()
-
-        for tag_lc, (self_close, open_tag, close_tag) in XML_PATTERNS.items():
-            if self_close.search(content_lower):
-                return 0
-            if open_tag.search(content_lower) and close_tag.search(content_lower):
-                return 0
-            elif open_tag.search(content_lower):
-                return 1
-        return 0
-    except Exception:
-        return 1
-
 # === FILE ANALYSIS FUNCTIONS END ===
 
-def get_file_info(file_path, ffprobe_path, archive_root, queryname, cachename, inf_url=None, special_path=None):
+def video_log_path(archive_root, queryname, cachename):
+    if CUSTOM_QUERY_MODE:
+        return os.path.join(archive_root, "ARCHIVE", queryname, cachename, "log_VIDEO_ANALYSIS.log")
+    return os.path.join(archive_root, "ARCHIVE", "log_VIDEO_ANALYSIS.log")
+
+def get_file_info(file_path, ffprobe_path, archive_root, queryname, cachename, inf_url=None, special_path=None, fields=None):
+    # fields limits the work to the listed keys ('ext' is always returned), None computes everything
     ext = get_file_extension(file_path)
     ext_lc = ext.lower()
     
-    size = get_file_size(file_path)
-    
+    # One read gives size, SDATA trailer and the SHA1, which comes first so the verdicts
+    # below can be shared between identical copies
+    probe = FileProbe(file_path, sha1=fields is None or 'sha1' in fields)
+    if probe.error is not None:
+        dbg("Error reading %s: %s", file_path, probe.error)
+    size = probe.size
+    sha1 = probe.sha1
+
     sdatver = -1
-    if ext_lc == '.sdat':
-        ver = get_sdata_version(file_path, size)
+    if ext_lc == '.sdat' and (fields is None or 'sdatver' in fields):
+        ver = probe.sdata_version()
         try:
             sdatver = float(ver)
         except (ValueError, TypeError):
             sdatver = -1
 
-    sha1 = calculate_sha1(file_path)
-
     imgcor = "NA"
-    if ext_lc in ['.png', '.jpg', '.jpeg', '.dds']:
-        imgcor = is_image_corrupt(file_path)
+    if ext_lc in ['.png', '.jpg', '.jpeg', '.dds'] and (fields is None or 'imgcor' in fields):
+        kind = 'image' if IMAGE_CHECK_MODE == "strict" else f"image-{IMAGE_CHECK_MODE}"
+        imgcor = memoized_verdict(sha1, kind, lambda: is_image_corrupt(file_path, IMAGE_CHECK_MODE))
 
     vidcor = "NA"
-    if ext_lc in ['.mp4', '.m4v']:
+    if ext_lc in ['.mp4', '.m4v'] and (fields is None or 'vidcor' in fields):
         if not os.path.exists(ffprobe_path):
             dbg("Warning: ffprobe path is invalid or missing: %s", ffprobe_path)
             vidcor = -1
         else:
-            if CUSTOM_QUERY_MODE:
-                log_path = os.path.join(archive_root, "ARCHIVE", queryname, cachename, "log_VIDEO_ANALYSIS.log")
-            else:
-                log_path = os.path.join(archive_root, "ARCHIVE", "log_VIDEO_ANALYSIS.log")
-
-            vidcor = analyze_video(file_path, ffprobe_path, log_path=log_path, inf_url=inf_url)
+            log_path = video_log_path(archive_root, queryname, cachename)
+            vidcor = analyze_video(file_path, ffprobe_path, log_path=log_path, inf_url=inf_url, sha1=sha1)
 
     xmlcor = "NA"
-    if ext_lc == '.xml':
+    if ext_lc == '.xml' and (fields is None or 'xmlcor' in fields):
         fname = Path(special_path).name if special_path else Path(file_path).name
         if fname.lower() in (name.lower() for name in XML_ENCRYPTED):
             xmlcor = 0
         else:
-            xmlcor = is_xml_corrupt(file_path)
+            xmlcor = memoized_verdict(sha1, 'xml', lambda: is_xml_corrupt(file_path))
 
-    return {
+    info = {
         'ext': ext,
         'size': size,
         'sdatver': sdatver,
@@ -265,7 +244,46 @@ def get_file_info(file_path, ffprobe_path, archive_root, queryname, cachename, i
         'vidcor': vidcor if vidcor != "NA" else -1,
         'xmlcor': xmlcor if xmlcor != "NA" else -1
     }
-
+    if fields is not None:
+        info = {k: v for k, v in info.items() if k == 'ext' or k in fields}
+    return info
+
+
+def get_target_info(file_path, ffprobe_path, archive_root, queryname, cachename, sha1=True):
+    # With sha1=False only the size is needed, so a target without a manifest entry is
+    # not hashed; its info then has no 'sha1' key until a later call asks for one
+    info = ARCHIVE_SNAPSHOT.info(file_path)
+    if info is not None and (not sha1 or 'sha1' in info):
+        return info
+    cached = ARCHIVE_MANIFEST.lookup(file_path) if ARCHIVE_MANIFEST is not None else None
+    if cached:
+        dbg("[MANIFEST] Using recorded SHA1 for %s", file_path)
+        info = {'ext': get_file_extension(str(file_path)), 'size': cached['size'], 'sha1': cached['sha1']}
+    else:
+        fields = TARGET_FIELDS if sha1 else {'size'}
+        info = get_file_info(str(file_path), ffprobe_path, archive_root, queryname, cachename, fields=fields)
+        if ARCHIVE_MANIFEST is not None and info and sha1:
+            ARCHIVE_MANIFEST.record(file_path, info['sha1'])
+    if info:
+        ARCHIVE_SNAPSHOT.remember(file_path, info)
+    return info
+
+def matches_target(src, size, sha1, target, ffprobe_path, archive_root, queryname, cachename):
+    # Whether the archived target holds the same bytes as src. Sizes are compared first,
+    # then a partial fingerprint of both files, and only when those agree is the target's
+    # full SHA1 computed (and recorded in the manifest) to compare with src's
+    info = get_target_info(str(target), ffprobe_path, archive_root, queryname, cachename, sha1=False)
+    if not info or info['size'] != size:
+        return False
+    if 'sha1' not in info and partial_fingerprint(src) != partial_fingerprint(target):
+        return False
+    return get_target_info(str(target), ffprobe_path, archive_root, queryname, cachename)['sha1'] == sha1
+
+def rename_archived(src, dst):
+    Path(src).rename(dst)
+    if ARCHIVE_MANIFEST is not None:
+        ARCHIVE_MANIFEST.rename(src, dst)
+    ARCHIVE_SNAPSHOT.rename(src, dst)
 
 def ensure_dir(path):
     dbg("Ensuring directory exists: %s", path)
@@ -281,8 +299,8 @@ def construct_full_target_path(archive_root, queryname, cachename, special_path)
     dbg("Constructed full target path: %s", full_path)
     return full_path
 
-def copy_file(src, dst, message="", inf_fields=None, special_path=None, log_override=True):
-    global copied_count, OVERRIDE_NEW_LOG
+def copy_file(src, dst, message="", inf_fields=None, special_path=None, log_override=True, sha1=None):
+    global copied_count
 
     dbg("Copying from %s to %s", src, dst)
 
@@ -290,7 +308,16 @@ def copy_file(src, dst, message="", inf_fields=None, special_path=None, log_over
         log_line = f"[VERBOSE] COPIED {copied_count + 1} {message}"
     else:
         ensure_dir(os.path.dirname(dst))
-        shutil.copy2(src, dst)
+        # The copy reads src again; its digest verifies the analysis SHA1 against the
+        # bytes actually written rather than saving a read
+        _, written_sha1 = place_file(src, dst, LINK_MODE)
+        if written_sha1:
+            if sha1 and written_sha1 != sha1:
+                print(f"WARNING: {src} changed after it was analysed ( {sha1} -> {written_sha1} )")
+            sha1 = written_sha1
+        if ARCHIVE_MANIFEST is not None:
+            ARCHIVE_MANIFEST.record(dst, sha1)
+        ARCHIVE_SNAPSHOT.add(dst)
         log_line = f"COPIED {copied_count + 1} {message}"
 
     copied_count += 1
@@ -303,11 +330,8 @@ def copy_file(src, dst, message="", inf_fields=None, special_path=None, log_over
 
     if OVERRIDE_NEW_MODE and log_override and inf_fields and special_path is not None:
         if len(inf_fields) >= 4:
-            if OVERRIDE_NEW_LOG is None:
-                os.makedirs(os.path.dirname(OVERRIDE_LOG_PATH), exist_ok=True)
-                OVERRIDE_NEW_LOG = open(OVERRIDE_LOG_PATH, 'a', encoding='utf-8')
-            OVERRIDE_NEW_LOG.write(f"{inf_fields[0]}|{special_path}|{inf_fields[2]}|{inf_fields[3]}\n")
-            OVERRIDE_NEW_LOG.flush()
+            os.makedirs(os.path.dirname(OVERRIDE_LOG_PATH), exist_ok=True)
+            RUN_LOGS.write(OVERRIDE_LOG_PATH, f"{inf_fields[0]}|{special_path}|{inf_fields[2]}|{inf_fields[3]}\n")
             
 def incremental_copy(src, dst, override, ffprobe_path):
     dst = Path(dst)
@@ -319,94 +343,101 @@ def incremental_copy(src, dst, override, ffprobe_path):
 
     if override == "1":
         dbg("Override is 1, using original path: %s", original_target)
-        cor_old = {'fileext': '', 'filesize': -1, 'sha1': ''}
-        if original_target.exists():
-            info = get_file_info(str(original_target), ffprobe_path, archive_root, queryname, cachename)
+        cor_old = {'fileext': '', 'filesize': -1}
+        if ARCHIVE_SNAPSHOT.exists(original_target):
+            info = get_target_info(str(original_target), ffprobe_path, archive_root, queryname, cachename, sha1=False)
             if info:
                 cor_old = {
                     'fileext': info['ext'],
-                    'filesize': info['size'],
-                    'sha1': info['sha1']
+                    'filesize': info['size']
                 }
         return str(original_target), cor_old
 
-    if not original_target.exists():
+    if not ARCHIVE_SNAPSHOT.exists(original_target):
         dbg("Original target doesn't exist, using it directly: %s", original_target)
-        return str(original_target), {'fileext': '', 'filesize': -1, 'sha1': ''}
+        return str(original_target), {'fileext': '', 'filesize': -1}
 
     dbg("Finding unique target for duplicate: %s", original_target)
     counter = -1
     while True:
         candidate = dir_name / f"{base}{counter}{ext}"
-        if not candidate.exists():
+        if not ARCHIVE_SNAPSHOT.exists(candidate):
             break
         counter -= 1
 
     final_target = dir_name / f"{base}{counter}{ext}"
     dbg("Using fallback path: %s", final_target)
-    return str(final_target), {'fileext': '', 'filesize': -1, 'sha1': ''}
-
-def update_log_file_entry(logfile, special_path, date, with_x=False):
-    # Ensures ONLY one entry per special_path, updated with x if needed
-    lines = []
-    found = False
-    if os.path.exists(logfile):
-        with open(logfile, 'r', encoding='utf-8') as f:
-            for line in f:
-                if line.startswith(f"{special_path}\t"):
-                    found = True
-                    line = f"{special_path}\t{date}" + ("\tx" if with_x else "")
-                else:
-                    line = line.rstrip('\n')
-                lines.append(line)
-    if not found:
+    return str(final_target), {'fileext': '', 'filesize': -1}
+
+class DateLog:
+    # In-memory copy of a cdnfiles/dcfiles log. Rows keep their on-disk order and
+    # the file is rewritten atomically on flush or every CHECKPOINT_SECONDS.
+    CHECKPOINT_SECONDS = 60
+
+    def __init__(self, path, strip_lines=False):
+        self.path = path
+        self.strip_lines = strip_lines
+        self.lines = []
+        self.rows = {}
+        self.dirty = False
+        self.last_flush = time.monotonic()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    self._add(line.rstrip('\n'))
+
+    def _add(self, line):
+        parts = (line.strip() if self.strip_lines else line).split('\t')
+        if len(parts) >= 2:
+            self.rows.setdefault(parts[0], []).append(len(self.lines))
+        self.lines.append(line)
+
+    def lookup(self, special_path):
+        # First row for special_path, split into fields
+        rows = self.rows.get(special_path)
+        if not rows:
+            return None
+        line = self.lines[rows[0]]
+        return (line.strip() if self.strip_lines else line).split('\t')
+
+    def append(self, special_path, date, with_x=False):
+        self._add(f"{special_path}\t{date}" + ("\tx" if with_x else ""))
+        self._changed()
+
+    def update(self, special_path, date, with_x=False):
+        # Ensures ONLY one entry per special_path, updated with x if needed
         line = f"{special_path}\t{date}" + ("\tx" if with_x else "")
-        lines.append(line)
-    with open(logfile, 'w', encoding='utf-8') as f:
-        for l in lines:
-            f.write(l + '\n')
-
-def process_inf_line(line, archive_root, search_root, queryname, cachename, ffprobe_path, nofileforinf_file, dupes_file, cdnfiles_file, dcfiles_file, exceptions_modified_set=None, exceptions_corrupt_set=None):
-    global copied_count, corrupt_count, modified_count, dupe_count, multiple_matched_dat_files
-    parts = line.strip().split('|')
-    if len(parts) < 4:
-        return
-    if cachename and cachename.strip() and parts[3].strip().lower() != cachename.strip().lower():
-        return
-
-    dbg("Processing line: %s", line.strip())
-    
-    if not cachename or not cachename.strip():
-        cachename = parts[3].strip()
-    
-    c, d, raw_date, _ = parts[:4]
-
-    DATE_MAP = {
-        'Jan': '01', 'Feb': '02', 'Mar': '03', 'Apr': '04',
-        'May': '05', 'Jun': '06', 'Jul': '07', 'Aug': '08',
-        'Sep': '09', 'Oct': '10', 'Nov': '11', 'Dec': '12',
-    }
-
-    parsed_date = "null"
-    parsed_date_dcfile = "null" 
-    if raw_date and raw_date.lower() != "null":
-        try:
-            day = raw_date[:2]
-            month_str = raw_date[2:5]
-            year = raw_date[5:]
-            month = DATE_MAP.get(month_str, "??")
-            if month != "??":
-                parsed_date = f"{year}-{month}-{day}"
-                parsed_date_dcfile = f"{year}{month}{day}"
-        except Exception as e:
-            dbg("Failed to parse date '%s': %s", raw_date, e)
-
+        rows = self.rows.get(special_path)
+        if rows:
+            for idx in rows:
+                self.lines[idx] = line
+            self._changed()
+        else:
+            self.append(special_path, date, with_x)
+
+    def _changed(self):
+        self.dirty = True
+        if time.monotonic() - self.last_flush >= self.CHECKPOINT_SECONDS:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.dirty:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for l in self.lines:
+                f.write(l + '\n')
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+def map_inf_url(d, log=dbg):
     inf_url = d
     ext = Path(inf_url).suffix
     inf_url_parts = inf_url.split('/')
     inf_url_host = inf_url_parts[0].lower() if inf_url_parts else ""
     
-    dbg("Parsed inf_url_host: %s", inf_url_host)
+    log("Parsed inf_url_host: %s", inf_url_host)
     
     root_folder_map = {
         "scee": "scee-home.playstation.net",
@@ -470,16 +501,179 @@ def process_inf_line(line, archive_root, search_root, queryname, cachename, ffpr
         FLICKR_FARMS = [f"farm{i}.staticflickr.com" for i in range(1, 10)]
         if inf_url_host in FLICKR_FARMS:
             corrected_host = inf_url_host.replace("staticflickr.com", "static.flickr.com")
-            dbg("Correcting Flickr host: %s -> %s", inf_url_host, corrected_host)
+            log("Correcting Flickr host: %s -> %s", inf_url_host, corrected_host)
             inf_url = d.replace(inf_url_host, corrected_host, 1)
             inf_url_host = corrected_host
         else:
-            dbg("No correction needed for host: %s", inf_url_host)
+            log("No correction needed for host: %s", inf_url_host)
+
+    return inf_url
+
+def patch_extensionless_path(file, inf_url, special_path, log=dbg):
+    probe = FileProbe(file, sha1=False)
+    if probe.error is not None:
+        log("Failed to detect type for extensionless file %s: %s", file, probe.error)
+        return inf_url, special_path
+    sniffed = probe.sniff_type()
+    if sniffed == "json":
+        if not inf_url.endswith('.json'):
+            inf_url += ".json"
+            special_path += ".json"
+            log("[EXTENSIONLESS] Patched path .json : %s", file)
+    elif sniffed == "xml":
+        if not inf_url.endswith('.xml'):
+            inf_url += ".xml"
+            special_path += ".xml"
+            log("[EXTENSIONLESS] Patched path with .xml : %s", file)
+    return inf_url, special_path
+
+# === ANALYSIS WORKER POOL START ===
+
+def no_log(msg, *args):
+    pass
+
+def init_analysis_worker(custom_query_mode, video_probe_mode, video_timeout, image_check_mode, verdict_db_path):
+    global CUSTOM_QUERY_MODE, VIDEO_PROBE_MODE, VIDEO_TIMEOUT, IMAGE_CHECK_MODE, DEBUG_ENABLED, VERDICT_MEMO
+    CUSTOM_QUERY_MODE = custom_query_mode
+    VIDEO_PROBE_MODE = video_probe_mode
+    VIDEO_TIMEOUT = video_timeout
+    IMAGE_CHECK_MODE = image_check_mode
+    DEBUG_ENABLED = False
+    # Workers read stored verdicts but hand new ones back, only the committer writes them
+    VERDICT_MEMO = VerdictMemo(db_path=verdict_db_path)
+    # Video log lines are handed back to the committer, workers never open the log file
+    logging.getLogger().handlers[:] = [logging.NullHandler()]
+
+def analyze_source_file(file_path, ffprobe_path, archive_root, queryname, cachename, inf_url, special_path):
+    global _captured_video_log
+    _captured_video_log = []
+    try:
+        info = get_file_info(file_path, ffprobe_path, archive_root, queryname, cachename, inf_url=inf_url, special_path=special_path)
+        return info, _captured_video_log, VERDICT_MEMO.drain() if VERDICT_MEMO is not None else {}
+    finally:
+        _captured_video_log = None
+
+def analysis_context(inf_url, special_path):
+    return f"{inf_url}|{special_path}|{VIDEO_PROBE_MODE}|{IMAGE_CHECK_MODE}"
+
+def is_cacheable_analysis(info):
+    # Inconclusive results are not stored so the file gets checked again next run: a
+    # timeout may be transient, and a video gets vidcor -1 only when ffprobe is missing
+    if not info or info['sha1'] == "ERROR" or info['size'] == -1:
+        return False
+    if info['vidcor'] == TIMEOUT_VERDICT:
+        return False
+    return not (info['ext'].lower() in ('.mp4', '.m4v') and info['vidcor'] == -1)
+
+def cached_source_analysis(file_path, inf_url, special_path):
+    if ANALYSIS_CACHE is None:
+        return None
+    cached = ANALYSIS_CACHE.lookup(file_path, "cache_copy", analysis_context(inf_url, special_path))
+    if cached is None:
+        return None
+    dbg("[ANALYSIS CACHE] Using cached analysis for %s", file_path)
+    return cached['info'], cached['video_log']
+
+def store_source_analysis(file_path, inf_url, special_path, info, video_log):
+    if ANALYSIS_CACHE is None or not is_cacheable_analysis(info):
+        return
+    ANALYSIS_CACHE.store(file_path, "cache_copy", {'info': info, 'video_log': video_log}, analysis_context(inf_url, special_path))
+
+def submit_source_analyses(pool, line, archive_root, queryname, cachename, ffprobe_path, dat_index):
+    # Resolves the same DAT files and paths as process_inf_line, without touching the archive
+    prefetched = {}
+    parts = line.strip().split('|')
+    if len(parts) < 4:
+        return prefetched
+    if cachename and cachename.strip() and parts[3].strip().lower() != cachename.strip().lower():
+        return prefetched
+    if not cachename or not cachename.strip():
+        cachename = parts[3].strip()
+
+    c, d = parts[:2]
+    inf_url = map_inf_url(d, log=no_log)
+    special_path = inf_url.strip('/')
+    for file in find_dat_files(dat_index, c):
+        if file.suffix == "":
+            inf_url, special_path = patch_extensionless_path(file, inf_url, special_path, log=no_log)
+        # Cache hits are kept as plain (info, video_log) tuples, everything else is a future
+        # resolving to (info, video_log, new_verdicts)
+        cached = cached_source_analysis(str(file), inf_url, special_path)
+        if cached is not None:
+            prefetched[(str(file), inf_url, special_path)] = cached
+            continue
+        prefetched[(str(file), inf_url, special_path)] = pool.submit(
+            analyze_source_file, str(file), ffprobe_path, archive_root, queryname, cachename, inf_url, special_path
+        )
+    return prefetched
+
+def get_source_info(file, ffprobe_path, archive_root, queryname, cachename, inf_url, special_path, prefetched=None):
+    key = (str(file), inf_url, special_path)
+    if prefetched and key in prefetched:
+        result = prefetched.pop(key)
+        if isinstance(result, tuple):
+            info, video_log = result
+        else:
+            info, video_log, new_verdicts = result.result()
+            if VERDICT_MEMO is not None:
+                for (sha1, kind), verdict in new_verdicts.items():
+                    VERDICT_MEMO.put(sha1, kind, verdict)
+            store_source_analysis(str(file), inf_url, special_path, info, video_log)
+    else:
+        cached = cached_source_analysis(str(file), inf_url, special_path)
+        if cached is not None:
+            info, video_log = cached
+        else:
+            info, video_log, _ = analyze_source_file(str(file), ffprobe_path, archive_root, queryname, cachename, inf_url, special_path)
+            store_source_analysis(str(file), inf_url, special_path, info, video_log)
+    if video_log:
+        setup_video_log(video_log_path(archive_root, queryname, cachename))
+        for message in video_log:
+            log_and_print(message)
+    return info
+
+# === ANALYSIS WORKER POOL END ===
+
+def process_inf_line(line, archive_root, search_root, queryname, cachename, ffprobe_path, nofileforinf_file, dupes_file, cdnfiles_log, dcfiles_log, exceptions_modified_set=None, exceptions_corrupt_set=None, dat_index=None, prefetched=None):
+    global copied_count, corrupt_count, modified_count, dupe_count, multiple_matched_dat_files
+    parts = line.strip().split('|')
+    if len(parts) < 4:
+        return
+    if cachename and cachename.strip() and parts[3].strip().lower() != cachename.strip().lower():
+        return
 
+    dbg("Processing line: %s", line.strip())
+    
+    if not cachename or not cachename.strip():
+        cachename = parts[3].strip()
+    
+    c, d, raw_date, _ = parts[:4]
+
+    DATE_MAP = {
+        'Jan': '01', 'Feb': '02', 'Mar': '03', 'Apr': '04',
+        'May': '05', 'Jun': '06', 'Jul': '07', 'Aug': '08',
+        'Sep': '09', 'Oct': '10', 'Nov': '11', 'Dec': '12',
+    }
+
+    parsed_date = "null"
+    parsed_date_dcfile = "null" 
+    if raw_date and raw_date.lower() != "null":
+        try:
+            day = raw_date[:2]
+            month_str = raw_date[2:5]
+            year = raw_date[5:]
+            month = DATE_MAP.get(month_str, "??")
+            if month != "??":
+                parsed_date = f"{year}-{month}-{day}"
+                parsed_date_dcfile = f"{year}{month}{day}"
+        except Exception as e:
+            dbg("Failed to parse date '%s': %s", raw_date, e)
+
+    inf_url = map_inf_url(d)
     special_path = inf_url.strip('/')
     
     dbg("Searching for %s_DAT*", c)
-    dat_files = [f for f in Path(search_root).rglob(f"{c}_DAT*") if f.is_file()]
+    dat_files = find_dat_files(dat_index, c)
     dbg("Found %d file(s) for %s_DAT*", len(dat_files), c)
 
     if len(dat_files) > 1:
@@ -487,37 +681,17 @@ def process_inf_line(line, archive_root, search_root, queryname, cachename, ffpr
 
     if not dat_files:
         dbg("No DAT files found for %s, logging to nofiles", c)
-        with open(nofileforinf_file, 'a', encoding='utf-8', errors='ignore') as nf:
-            nf.write(f"{cachename}\t{c}_INF\t{special_path}\n")
+        RUN_LOGS.write(nofileforinf_file, f"{cachename}\t{c}_INF\t{special_path}\n")
         return
         
     for file in dat_files:
         dbg("Analyzing file: %s", file)
     
         if file.suffix == "":
-            try:
-                with open(file, 'r', encoding='utf-8', errors='ignore') as f:
-                    chunk = f.read(2048).strip()
-                chunk_lower = chunk.lower()
-                if chunk.startswith('{') or chunk.startswith('['):
-                    if not inf_url.endswith('.json'):
-                        inf_url += ".json"
-                        special_path += ".json"
-                        dbg("[EXTENSIONLESS] Patched path .json : %s", file)
-                elif chunk.startswith('<'):
-                    if (
-                        '<xml' in chunk_lower or 
-                        any(tag in chunk_lower for tag in ['<?xml', '<rss', '<profile'])
-                    ):
-                        if not inf_url.endswith('.xml'):
-                            inf_url += ".xml"
-                            special_path += ".xml"
-                            dbg("[EXTENSIONLESS] Patched path with .xml : %s", file)
-            except Exception as e:
-                dbg("Failed to detect type for extensionless file %s: %s", file, e)
+            inf_url, special_path = patch_extensionless_path(file, inf_url, special_path)
     
         normal_target = construct_full_target_path(archive_root, queryname, cachename, special_path)
-        info = get_file_info(str(file), ffprobe_path, archive_root, queryname, cachename, inf_url=inf_url, special_path=special_path)
+        info = get_source_info(file, ffprobe_path, archive_root, queryname, cachename, inf_url, special_path, prefetched)
         if not info:
             continue
     
@@ -545,15 +719,15 @@ def process_inf_line(line, archive_root, search_root, queryname, cachename, ffpr
                 
             corrupt_target = construct_full_target_path(archive_root, queryname, cachename, f"corrupted/{special_path}")
             
-            if Path(corrupt_target).exists():
-                cor_old = get_file_info(str(corrupt_target), ffprobe_path, archive_root, queryname, cachename)
-                if cor_old and sha1 != cor_old['sha1'] and size > cor_old['size']:
+            if ARCHIVE_SNAPSHOT.exists(corrupt_target):
+                cor_old = get_target_info(str(corrupt_target), ffprobe_path, archive_root, queryname, cachename, sha1=False)
+                if cor_old and size > cor_old['size']:
                     final_target, _ = incremental_copy(str(file), str(corrupt_target), "1", ffprobe_path)
-                    copy_file(file, final_target, f"{cachename}/corrupted/{special_path} - CORRUPT ( NEW FILE SIZE )", parts, special_path, log_override=False)
+                    copy_file(file, final_target, f"{cachename}/corrupted/{special_path} - CORRUPT ( NEW FILE SIZE )", parts, special_path, log_override=False, sha1=sha1)
                     corrupt_count += 1
             else:
                 final_target, _ = incremental_copy(str(file), str(corrupt_target), "1", ffprobe_path)
-                copy_file(file, final_target, f"{cachename}/corrupted/{special_path} - CORRUPT", parts, special_path, log_override=False)
+                copy_file(file, final_target, f"{cachename}/corrupted/{special_path} - CORRUPT", parts, special_path, log_override=False, sha1=sha1)
                 corrupt_count += 1
             continue
             
@@ -567,8 +741,8 @@ def process_inf_line(line, archive_root, search_root, queryname, cachename, ffpr
             mod_target = construct_full_target_path(archive_root, queryname, cachename, f"modified/{special_path}")
             
             final_target, cor_old = incremental_copy(str(file), str(mod_target), "0", ffprobe_path)
-            if sha1 != cor_old['sha1']:
-                copy_file(file, final_target, f"{cachename}/modified/{special_path} - MODIFIED", parts, special_path, log_override=False)
+            if cor_old['filesize'] < 0 or not matches_target(file, size, sha1, final_target, ffprobe_path, archive_root, queryname, cachename):
+                copy_file(file, final_target, f"{cachename}/modified/{special_path} - MODIFIED", parts, special_path, log_override=False, sha1=sha1)
                 modified_count += 1
             continue
 
@@ -580,28 +754,24 @@ def process_inf_line(line, archive_root, search_root, queryname, cachename, ffpr
         
             dbg(f"[DCFILES] Processing: {dupe_file_path} (parsed_date: {parsed_date_dcfile}, special_path: {special_path})")
             existing_date = None
-            if os.path.exists(dcfiles_file):
-                dbg(f"[DCFILES] Looking for previous date in {dcfiles_file} for {special_path}")
-                with open(dcfiles_file, encoding='utf-8') as dc:
-                    for l in dc:
-                        parts = l.strip().split('\t')
-                        if len(parts) >= 2 and parts[0] == special_path:
-                            existing_date = parts[1]
-                            dbg(f"[DCFILES] Found existing date for {special_path}: {existing_date}")
-                            break
+            dbg(f"[DCFILES] Looking for previous date in {dcfiles_log.path} for {special_path}")
+            dc_row = dcfiles_log.lookup(special_path)
+            if dc_row:
+                existing_date = dc_row[1]
+                dbg(f"[DCFILES] Found existing date for {special_path}: {existing_date}")
         
             should_copy = False
-            if normal_target.exists():
+            if ARCHIVE_SNAPSHOT.exists(normal_target):
                 dbg(f"[DCFILES] Target file exists: {normal_target}")
-                old_info = get_file_info(str(normal_target), ffprobe_path, archive_root, queryname, cachename)
-                if old_info and old_info['sha1'] == sha1:
+                if matches_target(file, size, sha1, normal_target, ffprobe_path, archive_root, queryname, cachename):
                     dbg(f"[DCFILES] SHA1 matches for {normal_target}, logging as dupe.")
-                    with open(dupes_file, 'a', encoding='utf-8') as dup:
-                        dup.write(f"{cachename}\t{file}\t{special_path}\n")
+                    RUN_LOGS.write(dupes_file, f"{cachename}\t{file}\t{special_path}\n")
                     dupe_count += 1
                     continue
-                elif old_info and old_info['sha1'] != sha1:
-                    dbg(f"[DCFILES] SHA1 differs (new: {sha1}, old: {old_info['sha1']})")
+                else:
+                    if DEBUG_ENABLED:
+                        old_info = get_target_info(str(normal_target), ffprobe_path, archive_root, queryname, cachename)
+                        dbg(f"[DCFILES] SHA1 differs (new: {sha1}, old: {old_info['sha1']})")
                     if existing_date is None or parsed_date_dcfile > existing_date:
                         dbg(f"[DCFILES] Date is newer or no previous date (parsed: {parsed_date_dcfile}, existing: {existing_date})")
                         should_copy = True
@@ -618,18 +788,16 @@ def process_inf_line(line, archive_root, search_root, queryname, cachename, ffpr
                     copy_file(
                         file, str(normal_target),
                         f"{cachename}/{special_path}",
-                        parts, special_path
+                        parts, special_path, sha1=sha1
                     )
-                    with open(dcfiles_file, 'a', encoding='utf-8') as dc:
-                        dc.write(f"{special_path}\t{parsed_date_dcfile}\n")
+                    dcfiles_log.append(special_path, parsed_date_dcfile)
                 else:
                     copy_file(
                         file, str(normal_target),
                         f"{cachename}/{special_path} ( NEWER DATE {parsed_date_dcfile} )",
-                        parts, special_path
+                        parts, special_path, sha1=sha1
                     )
-                    with open(dcfiles_file, 'a', encoding='utf-8') as dc:
-                        dc.write(f"{special_path}\t{parsed_date_dcfile}\tx\n")
+                    dcfiles_log.append(special_path, parsed_date_dcfile, with_x=True)
             continue
 
             
@@ -653,24 +821,22 @@ def process_inf_line(line, archive_root, search_root, queryname, cachename, ffpr
         
             incoming_sha1 = sha1
             dbg(f"[CDNFILES] Incoming SHA1: {incoming_sha1}")
-            found_sha1 = None
             found_slot = None
-            slot_sha1s = []
+            checked_slots = []
             for slot in candidates:
-                if slot.exists():
-                    info = get_file_info(str(slot), ffprobe_path, archive_root, queryname, cachename)
-                    slot_sha1s.append((str(slot), info['sha1']))
-                    if info['sha1'] == incoming_sha1:
-                        found_sha1 = info['sha1']
+                if ARCHIVE_SNAPSHOT.exists(slot):
+                    checked_slots.append(slot)
+                    if matches_target(file, size, incoming_sha1, slot, ffprobe_path, archive_root, queryname, cachename):
                         found_slot = slot
                         break
-            for p, sh in slot_sha1s:
-                dbg(f"[CDNFILES] Candidate: {p} SHA1: {sh}")
+            if DEBUG_ENABLED:
+                for slot in checked_slots:
+                    info = get_target_info(str(slot), ffprobe_path, archive_root, queryname, cachename)
+                    dbg(f"[CDNFILES] Candidate: {slot} SHA1: {info['sha1']}")
         
-            if found_sha1:
+            if found_slot:
                 dbg(f"[CDNFILES] SHA1 matched existing slot: {found_slot} (Dupe, not copying again)")
-                with open(dupes_file, 'a', encoding='utf-8') as dup:
-                    dup.write(f"{cachename}\t{dupe_file_path}\t{special_path}\n") 
+                RUN_LOGS.write(dupes_file, f"{cachename}\t{dupe_file_path}\t{special_path}\n")
                 dupe_count += 1
                 continue
         
@@ -682,26 +848,20 @@ def process_inf_line(line, archive_root, search_root, queryname, cachename, ffpr
                 main_file = target_dir / f"{stem}{suffix}"
                 date_file = target_dir / f"{stem}_{filedate_str}{suffix}"
             
-                if os.path.exists(cdnfiles_file):
-                    with open(cdnfiles_file, 'r', encoding='utf-8') as cdn:
-                        for l in cdn:
-                            parts = l.rstrip('\n').split('\t')
-                            if len(parts) >= 2 and parts[0] == special_path:
-                                found_cdn_date = parts[1]
-                                if len(parts) == 3 and parts[2].lower() == "x":
-                                    found_cdn_x = True
-                                break
+                cdn_row = cdnfiles_log.lookup(special_path)
+                if cdn_row:
+                    found_cdn_date = cdn_row[1]
+                    if len(cdn_row) == 3 and cdn_row[2].lower() == "x":
+                        found_cdn_x = True
             
                 dupe_found = False
                 dupe_slots = [main_file, date_file] + [
                     target_dir / f"{stem}_{filedate_str}-{n}{suffix}" for n in range(1, 100)
                 ]
                 for slot in dupe_slots:
-                    if slot.exists():
-                        info = get_file_info(str(slot), ffprobe_path, archive_root, queryname, cachename)
-                        if info and info['sha1'] == sha1:
-                            with open(dupes_file, 'a', encoding='utf-8') as dup:
-                                dup.write(f"{cachename}\t{dupe_file_path}\t{special_path}\n")
+                    if ARCHIVE_SNAPSHOT.exists(slot):
+                        if matches_target(file, size, sha1, slot, ffprobe_path, archive_root, queryname, cachename):
+                            RUN_LOGS.write(dupes_file, f"{cachename}\t{dupe_file_path}\t{special_path}\n")
                             dupe_count += 1
                             dbg(f"[CDNFILES] Found SHA1 match at {slot}, skipping copy")
                             dupe_found = True
@@ -710,9 +870,9 @@ def process_inf_line(line, archive_root, search_root, queryname, cachename, ffpr
                     continue
             
                 if found_cdn_date is None:
-                    copy_file(file, str(main_file), f"{cachename}/{Path(main_file).relative_to(Path(archive_root) / 'ARCHIVE').as_posix()}", parts, special_path)
+                    copy_file(file, str(main_file), f"{cachename}/{Path(main_file).relative_to(Path(archive_root) / 'ARCHIVE').as_posix()}", parts, special_path, sha1=sha1)
                     dbg(f"[CDNFILES] Copied to main (first dated file): {main_file}")
-                    update_log_file_entry(cdnfiles_file, special_path, parsed_yymmdd, with_x=False)
+                    cdnfiles_log.update(special_path, parsed_yymmdd, with_x=False)
                     dbg(f"[CDNFILES] CDN log updated: {special_path}\t{parsed_yymmdd}")
             
                 elif parsed_yymmdd > found_cdn_date:
@@ -721,116 +881,113 @@ def process_inf_line(line, archive_root, search_root, queryname, cachename, ffpr
                         if found_cdn_date and len(found_cdn_date) == 8 else found_cdn_date
                     )
                     old_dated_file = target_dir / f"{stem}_{olddate_filedate}{suffix}"
-                    if main_file.exists():
-                        if old_dated_file.exists():
+                    if ARCHIVE_SNAPSHOT.exists(main_file):
+                        if ARCHIVE_SNAPSHOT.exists(old_dated_file):
                             for n in range(1, 500):
                                 dupe_file = target_dir / f"{stem}_{olddate_filedate}-{n}{suffix}"
-                                if not dupe_file.exists():
-                                    main_file.rename(dupe_file)
+                                if not ARCHIVE_SNAPSHOT.exists(dupe_file):
+                                    rename_archived(main_file, dupe_file)
                                     dbg(f"[CDNFILES] Renamed existing main to: {dupe_file}")
                                     break
                         else:
-                            main_file.rename(old_dated_file)
+                            rename_archived(main_file, old_dated_file)
                             dbg(f"[CDNFILES] Renamed existing main to: {old_dated_file}")
-                    copy_file(file, str(main_file), f"{cachename}/{Path(main_file).relative_to(Path(archive_root) / 'ARCHIVE').as_posix()} ( UNIQUE DUPE WITH NEW DATE {parsed_yymmdd} )", parts, special_path)
+                    copy_file(file, str(main_file), f"{cachename}/{Path(main_file).relative_to(Path(archive_root) / 'ARCHIVE').as_posix()} ( UNIQUE DUPE WITH NEW DATE {parsed_yymmdd} )", parts, special_path, sha1=sha1)
                     dbg(f"[CDNFILES] Copied to main (newer date): {main_file}")
-                    update_log_file_entry(cdnfiles_file, special_path, parsed_yymmdd, with_x=True)
+                    cdnfiles_log.update(special_path, parsed_yymmdd, with_x=True)
                     dbg(f"[CDNFILES] CDN log updated: {special_path}\t{parsed_yymmdd}\tx")
             
                 else:
                     dupe_target = date_file
-                    if dupe_target.exists():
+                    if ARCHIVE_SNAPSHOT.exists(dupe_target):
                         for n in range(1, 500):
                             candidate = target_dir / f"{stem}_{filedate_str}-{n}{suffix}"
-                            if not candidate.exists():
+                            if not ARCHIVE_SNAPSHOT.exists(candidate):
                                 dupe_target = candidate
                                 break
-                    copy_file(file, str(dupe_target), f"{cachename}/{Path(dupe_target).relative_to(Path(archive_root) / 'ARCHIVE').as_posix()}  ( UNIQUE DUPE )", parts, special_path)
+                    copy_file(file, str(dupe_target), f"{cachename}/{Path(dupe_target).relative_to(Path(archive_root) / 'ARCHIVE').as_posix()}  ( UNIQUE DUPE )", parts, special_path, sha1=sha1)
                     dbg(f"[CDNFILES] Saved as dupe: {dupe_target}")
             
                 continue
 
 
             else:
-                if not main_file.exists():
-                    copy_file(file, str(main_file), f"{cachename}/{Path(main_file).relative_to(Path(archive_root) / 'ARCHIVE').as_posix()}", parts, special_path)
+                if not ARCHIVE_SNAPSHOT.exists(main_file):
+                    copy_file(file, str(main_file), f"{cachename}/{Path(main_file).relative_to(Path(archive_root) / 'ARCHIVE').as_posix()}", parts, special_path, sha1=sha1)
                     dbg(f"[CDNFILES] Copied to main (undated): {main_file}")
-                    update_log_file_entry(cdnfiles_file, special_path, "", with_x=False)
+                    cdnfiles_log.update(special_path, "", with_x=False)
                     dbg(f"[CDNFILES] CDN log updated (undated): {special_path}")
                 else:
                     for slot in candidates[1:]:
-                        if not slot.exists():
-                            copy_file(file, str(slot), f"{cachename}/{Path(main_file).relative_to(Path(archive_root) / 'ARCHIVE').as_posix()} ( UNIQUE DUPE )", parts, special_path)
+                        if not ARCHIVE_SNAPSHOT.exists(slot):
+                            copy_file(file, str(slot), f"{cachename}/{Path(main_file).relative_to(Path(archive_root) / 'ARCHIVE').as_posix()} ( UNIQUE DUPE )", parts, special_path, sha1=sha1)
                             dbg(f"[CDNFILES] Saved as dupe: {slot}")
                             break
                 continue
 
         # ----- MP3 FILES -----
         if ext_lc == '.mp3':
-            if normal_target.exists():
-                old_info = get_file_info(str(normal_target), ffprobe_path, archive_root, queryname, cachename)
+            if ARCHIVE_SNAPSHOT.exists(normal_target):
+                old_info = get_target_info(str(normal_target), ffprobe_path, archive_root, queryname, cachename, sha1=False)
                 if old_info:
-                    if sha1 == old_info['sha1']:
+                    if matches_target(file, size, sha1, normal_target, ffprobe_path, archive_root, queryname, cachename):
                         dbg(f"[MP3] SHA1 match for {dupe_file_path} and {normal_target}. Logging as dupe.")
-                        with open(dupes_file, 'a', encoding='utf-8') as dup:
-                            dup.write(f"{cachename}\t{dupe_file_path}\t{special_path}\n")
+                        RUN_LOGS.write(dupes_file, f"{cachename}\t{dupe_file_path}\t{special_path}\n")
                         dupe_count += 1
                         continue
                     if size > old_info['size']:
                         dbg(f"[MP3] SHA1 differs and new file is bigger ({size}>{old_info['size']}). Overwriting file.")
-                        copy_file(file, str(normal_target), f"{cachename}/{special_path} - {ext_lc} ( NEW FILE SIZE )", parts, special_path)
+                        copy_file(file, str(normal_target), f"{cachename}/{special_path} - {ext_lc} ( NEW FILE SIZE )", parts, special_path, sha1=sha1)
                         continue
                     else:
                         dbg(f"[MP3] SHA1 differs and new file is NOT bigger ({size}<={old_info['size']}). Skipping copy.")
                         continue
-            copy_file(file, str(normal_target), f"{cachename}/{special_path} - {ext_lc}", parts, special_path)
+            copy_file(file, str(normal_target), f"{cachename}/{special_path} - {ext_lc}", parts, special_path, sha1=sha1)
             continue
             
         # ----- OVERRIDE MODE: SDAT, BAR, PNG  -----
         if OVERRIDE_NEW_MODE and ext_lc in {'.sdat', '.bar', '.png'}:
-            if normal_target.exists():
-                old_info = get_file_info(str(normal_target), ffprobe_path, archive_root, queryname, cachename)
+            if ARCHIVE_SNAPSHOT.exists(normal_target):
+                old_info = get_target_info(str(normal_target), ffprobe_path, archive_root, queryname, cachename, sha1=False)
                 if old_info:
-                    if sha1 == old_info['sha1']:
+                    if matches_target(file, size, sha1, normal_target, ffprobe_path, archive_root, queryname, cachename):
                         dbg(f"[OVERRIDE] SHA1 match for {dupe_file_path} and {normal_target}. Logging as dupe.")
-                        with open(dupes_file, 'a', encoding='utf-8') as dup:
-                            dup.write(f"{cachename}\t{dupe_file_path}\t{special_path}\n")
+                        RUN_LOGS.write(dupes_file, f"{cachename}\t{dupe_file_path}\t{special_path}\n")
                         dupe_count += 1
                         continue
                     if size > old_info['size']:
                         dbg(f"[OVERRIDE] SHA1 differs and new file is bigger ({size}>{old_info['size']}). Overwriting file.")
-                        copy_file(file, str(normal_target), f"{cachename}/{special_path} - {ext_lc} ( NEW FILE SIZE )", parts, special_path)
+                        copy_file(file, str(normal_target), f"{cachename}/{special_path} - {ext_lc} ( NEW FILE SIZE )", parts, special_path, sha1=sha1)
                         continue
                     else:
                         dbg(f"[OVERRIDE] SHA1 differs and new file is NOT bigger ({size}<={old_info['size']}). Skipping copy.")
                         continue
-            copy_file(file, str(normal_target), f"{cachename}/{special_path} - {ext_lc}", parts, special_path)
+            copy_file(file, str(normal_target), f"{cachename}/{special_path} - {ext_lc}", parts, special_path, sha1=sha1)
             continue
 
         # ----- ALL OTHER FILES -----
-        if normal_target.exists():
+        if ARCHIVE_SNAPSHOT.exists(normal_target):
             dbg(f"[OTHER] {normal_target} exists. Checking for SHA1/size.")
-            old_info = get_file_info(str(normal_target), ffprobe_path, archive_root, queryname, cachename)
-            if old_info and old_info['sha1'] == sha1:
+            old_info = get_target_info(str(normal_target), ffprobe_path, archive_root, queryname, cachename, sha1=False)
+            if matches_target(file, size, sha1, normal_target, ffprobe_path, archive_root, queryname, cachename):
                 dbg(f"[OTHER] SHA1 match. Logging as dupe. File: {dupe_file_path} Existing: {normal_target}")
-                with open(dupes_file, 'a', encoding='utf-8') as dup:
-                    dup.write(f"{cachename}\t{dupe_file_path}\t{special_path}\n")
+                RUN_LOGS.write(dupes_file, f"{cachename}\t{dupe_file_path}\t{special_path}\n")
                 dupe_count += 1
                 continue
         
-            elif old_info and old_info['sha1'] != sha1 and size > old_info['size']:
+            elif old_info and size > old_info['size']:
                 dbg(f"[OTHER] SHA1 differs, incoming file is larger ({size}>{old_info['size']}). Moving old main to dupe and promoting new file.")
                 stem, suffix = normal_target.stem, normal_target.suffix
                 parent = normal_target.parent
                 for n in range(1, 100):
                     dupe_candidate = parent / f"{stem}-{n}{suffix}"
-                    if not dupe_candidate.exists():
+                    if not ARCHIVE_SNAPSHOT.exists(dupe_candidate):
                         dbg(f"[OTHER] Renaming {normal_target} -> {dupe_candidate}")
-                        normal_target.rename(dupe_candidate)
+                        rename_archived(normal_target, dupe_candidate)
                         break
                 final_target = str(normal_target)
                 dbg(f"[OTHER] Copying new main: {dupe_file_path} -> {final_target}")
-                copy_file(file, final_target, f"{cachename}/{Path(final_target).relative_to(Path(archive_root) / 'ARCHIVE').as_posix()} - UNIQUE DUPE ( NEW FILE SIZE )", parts, special_path)
+                copy_file(file, final_target, f"{cachename}/{Path(final_target).relative_to(Path(archive_root) / 'ARCHIVE').as_posix()} - UNIQUE DUPE ( NEW FILE SIZE )", parts, special_path, sha1=sha1)
                 continue
         
             else:
@@ -840,14 +997,12 @@ def process_inf_line(line, archive_root, search_root, queryname, cachename, ffpr
                 parent = normal_target.parent
                 for n in range(1, 100):
                     dupe_candidate = parent / f"{stem}-{n}{suffix}"
-                    if not dupe_candidate.exists():
+                    if not ARCHIVE_SNAPSHOT.exists(dupe_candidate):
                         dbg(f"[OTHER] Dupe slot {dupe_candidate} is available.")
                         break
-                    dupe_info = get_file_info(str(dupe_candidate), ffprobe_path, archive_root, queryname, cachename)
-                    if dupe_info and dupe_info['sha1'] == sha1:
+                    if matches_target(file, size, sha1, dupe_candidate, ffprobe_path, archive_root, queryname, cachename):
                         dbg(f"[OTHER] Found existing dupe with matching SHA1: {dupe_candidate}")
-                        with open(dupes_file, 'a', encoding='utf-8') as dup:
-                            dup.write(f"{cachename}\t{dupe_file_path}\t{dupe_candidate.name}\n")
+                        RUN_LOGS.write(dupes_file, f"{cachename}\t{dupe_file_path}\t{dupe_candidate.name}\n")
                         dupe_count += 1
                         found_duplicate = True
                         break
@@ -856,11 +1011,11 @@ def process_inf_line(line, archive_root, search_root, queryname, cachename, ffpr
                     continue
                 final_target, _ = incremental_copy(str(file), str(normal_target), "0", ffprobe_path)
                 dbg(f"[OTHER] Copying as new dupe: {dupe_file_path} -> {final_target}")
-                copy_file(file, final_target, f"{cachename}/{Path(final_target).relative_to(Path(archive_root) / 'ARCHIVE').as_posix()} - UNIQUE DUPE", parts, special_path)
+                copy_file(file, final_target, f"{cachename}/{Path(final_target).relative_to(Path(archive_root) / 'ARCHIVE').as_posix()} - UNIQUE DUPE", parts, special_path, sha1=sha1)
                 continue
         
         final_target, _ = incremental_copy(str(file), str(normal_target), OVERRIDE_MODE, ffprobe_path)
-        copy_file(file, final_target, f"{cachename}/{special_path}", parts, special_path)
+        copy_file(file, final_target, f"{cachename}/{special_path}", parts, special_path, sha1=sha1)
 
 
 def format_duration(seconds):
@@ -902,13 +1057,25 @@ def sort_dupes_file_by_target_path(dupes_file_path):
     except Exception as e:
         dbg(f"[ERROR] Failed to sort dupes file: {e}")
 
+def read_cache_list(cachelist_path):
+    pairs = []
+    with open(cachelist_path, encoding='utf-8') as f:
+        for line in f:
+            parts = line.rstrip('\r\n').split('|')
+            if len(parts) >= 2 and parts[0].strip():
+                pairs.append((parts[0].strip(), parts[1].strip()))
+    return pairs
+
 if __name__ == '__main__':
     global debug_log
 
+    multiprocessing.freeze_support()
+    debug_log = None
+
     start_time = datetime.now()
 
     if len(sys.argv) < 11:
-        print("Usage: cache_copy_combined.py <archive_root> <queryname> <cachename> <search_root> <inf_file_path> <ffprobe_path> <dupes_logfile_path> <nofileforinf_logfile_path> <cdnfiles_log_path> <dcfiles_log_path> [exceptions_modified_filepath] [exceptions_corrupt_filepath] [--customquery] [--skipincrcopy] [--verbose] [--debug] [--override <newfiles_log_path>]")
+        print("Usage: cache_copy_combined.py <archive_root> <queryname> <cachename> <search_root> <inf_file_path> <ffprobe_path> <dupes_logfile_path> <nofileforinf_logfile_path> <cdnfiles_log_path> <dcfiles_log_path> [exceptions_modified_filepath] [exceptions_corrupt_filepath] [--customquery] [--skipincrcopy] [--verbose] [--debug] [--link-mode {copy,hardlink,reflink,auto}] [--video-probe {full,triage}] [--video-timeout SECONDS] [--strict-images] [--override <newfiles_log_path>] [--jobs N] [--cachelist <cachelist_path>] [--reanalyze]")
         sys.exit(1)
 
     archive_root = sys.argv[1]
@@ -950,6 +1117,41 @@ if __name__ == '__main__':
             OVERRIDE_LOG_PATH = sys.argv[i + 1]
             i += 2
             continue
+        elif arg == "--cachelist":
+            if i + 1 >= len(sys.argv):
+                print("Error: --cachelist requires a file of <cachename>|<search_root> lines")
+                sys.exit(1)
+            cachelist_file = sys.argv[i + 1]
+            i += 2
+            continue
+        elif arg == "--jobs":
+            if i + 1 >= len(sys.argv) or not sys.argv[i + 1].isdigit():
+                print("Error: --jobs requires a number of worker processes")
+                sys.exit(1)
+            JOBS = max(1, int(sys.argv[i + 1]))
+            i += 2
+            continue
+        elif arg == "--link-mode":
+            if i + 1 >= len(sys.argv) or sys.argv[i + 1] not in LINK_MODES:
+                print(f"Error: --link-mode requires one of: {', '.join(LINK_MODES)}")
+                sys.exit(1)
+            LINK_MODE = sys.argv[i + 1]
+            i += 2
+            continue
+        elif arg == "--video-probe":
+            if i + 1 >= len(sys.argv) or sys.argv[i + 1] not in VIDEO_PROBE_MODES:
+                print(f"Error: --video-probe requires one of: {', '.join(VIDEO_PROBE_MODES)}")
+                sys.exit(1)
+            VIDEO_PROBE_MODE = sys.argv[i + 1]
+            i += 2
+            continue
+        elif arg == "--video-timeout":
+            if i + 1 >= len(sys.argv) or not sys.argv[i + 1].isdigit():
+                print("Error: --video-timeout requires a number of seconds (0 = no limit)")
+                sys.exit(1)
+            VIDEO_TIMEOUT = int(sys.argv[i + 1]) or None
+            i += 2
+            continue
         elif arg == "--skipincrcopy":
             OVERRIDE_MODE = "1"
         elif arg == "--verbose":
@@ -958,22 +1160,58 @@ if __name__ == '__main__':
             CUSTOM_QUERY_MODE = True
         elif arg == "--debug":
             DEBUG_ENABLED = True
+        elif arg == "--reanalyze":
+            REANALYZE = True
+        elif arg == "--strict-images":
+            IMAGE_CHECK_MODE = "strict"
         i += 1
+    if "--video-timeout" not in sys.argv[next_arg:]:
+        VIDEO_TIMEOUT = default_video_timeout(VIDEO_PROBE_MODE)
 
-    if CUSTOM_QUERY_MODE:
-        base_copy_path = Path(archive_root) / "ARCHIVE" / queryname / cachename
-    else:
-        base_copy_path = Path(archive_root) / "ARCHIVE"
+    def copy_cache(cache_lines, start_time, pool=None):
+        global copied_count, corrupt_count, modified_count, dupe_count, multiple_matched_dat_files
+        global any_processed, started_processing, target_cachename, debug_log
 
-    if DEBUG_ENABLED:
-        debug_log_path = base_copy_path / "log_DEBUG.log"
-        os.makedirs(debug_log_path.parent, exist_ok=True)
-        debug_log = open(debug_log_path, 'a', encoding='utf-8', buffering=1)
-
-    target_cachename = cachename.strip().lower() if cachename else ""
+        copied_count = corrupt_count = modified_count = dupe_count = multiple_matched_dat_files = 0
+        any_processed = started_processing = False
 
-    with open(inf_file_path, encoding='utf-8') as f:
-        for line in f:
+        if CUSTOM_QUERY_MODE:
+            base_copy_path = Path(archive_root) / "ARCHIVE" / queryname / cachename
+        else:
+            base_copy_path = Path(archive_root) / "ARCHIVE"
+
+        if DEBUG_ENABLED:
+            # The previous cache's log stays open until here so late errors still reach it
+            if debug_log is not None:
+                debug_log.close()
+            debug_log_path = base_copy_path / "log_DEBUG.log"
+            os.makedirs(debug_log_path.parent, exist_ok=True)
+            debug_log = open(debug_log_path, 'a', encoding='utf-8', buffering=1)
+
+        target_cachename = cachename.strip().lower() if cachename else ""
+
+        dat_index = None
+        pending = deque()
+
+        def commit_line(line, prefetched=None):
+            process_inf_line(
+                line,
+                archive_root,
+                search_root,
+                queryname,
+                cachename,
+                ffprobe_path,
+                nofileforinf_file,
+                dupes_file,
+                cdnfiles_log,
+                dcfiles_log,
+                exceptions_modified_set,
+                exceptions_corrupt_set,
+                dat_index,
+                prefetched
+            )
+
+        for line in cache_lines:
             parts = line.rstrip('\r\n').split('|')
             if len(parts) >= 4 and parts[3].strip().lower() == target_cachename.lower():
                 if not started_processing:
@@ -981,60 +1219,92 @@ if __name__ == '__main__':
                         debug_log.write(f"[INIT] Processing ... {target_cachename}\n")
                         debug_log.flush()
                     started_processing = True
-                process_inf_line(
-                    line,
-                    archive_root,
-                    search_root,
-                    queryname,
-                    cachename,
-                    ffprobe_path,
-                    nofileforinf_file,
-                    dupes_file,
-                    cdnfiles_file,
-                    dcfiles_file,
-                    exceptions_modified_set,
-                    exceptions_corrupt_set
-                )
+                if dat_index is None:
+                    dbg("Indexing DAT files under: %s", search_root)
+                    dat_index = build_dat_index(search_root)
+                if pool is None:
+                    commit_line(line)
+                else:
+                    # Workers analyse ahead, lines are still committed one by one in INF order
+                    pending.append((line, submit_source_analyses(pool, line, archive_root, queryname, cachename, ffprobe_path, dat_index)))
+                    while len(pending) > JOBS * 4:
+                        commit_line(*pending.popleft())
                 any_processed = True
 
-    sort_dupes_file_by_target_path(dupes_file)
+        while pending:
+            commit_line(*pending.popleft())
+        cdnfiles_log.flush()
+        dcfiles_log.flush()
 
-    end_time = datetime.now()
-    duration_secs = (end_time - start_time).total_seconds()
+        end_time = datetime.now()
+        duration_secs = (end_time - start_time).total_seconds()
 
-    try:
-        start_fmt = start_time.strftime("%-m/%-d/%Y %H:%M:%S")
-        end_fmt = end_time.strftime("%-m/%-d/%Y %H:%M:%S")
-    except ValueError:
-        start_fmt = start_time.strftime("%#m/%#d/%Y %H:%M:%S")
-        end_fmt = end_time.strftime("%#m/%#d/%Y %H:%M:%S")
-
-    if any_processed:
-        print("\n=======================================================")
-        print(f"Cache Copy started at :          | {start_fmt}")
-        print(f"Cache Copy ended at :            | {end_fmt}")
-        print(f"Duration :                       | {format_duration(duration_secs)}")
-        print(f"Total files copied :             | {copied_count}")
-        print(f"Total corrupt files copied :     | {corrupt_count}")
-        print(f"Total modified files copied :    | {modified_count}")
-        print(f"Total dupes :                    | {dupe_count}")
-        print(f"Total INF w/ multi DAT matches : | {multiple_matched_dat_files}")
-        print("=======================================================\n")
-
-    if DEBUG_ENABLED and any_processed:
-        debug_log.write("\n=======================================================\n")
-        debug_log.write(f"Cache Copy started at :          {start_fmt}\n")
-        debug_log.write(f"Cache Copy ended at :            {end_fmt}\n")
-        debug_log.write(f"Duration :                       {format_duration(duration_secs)}\n")
-        debug_log.write(f"Total files copied :             {copied_count}\n")
-        debug_log.write(f"Total corrupt files copied :     {corrupt_count}\n")
-        debug_log.write(f"Total modified files copied :    {modified_count}\n")
-        debug_log.write(f"Total dupes :                    {dupe_count}\n")
-        debug_log.write(f"Total INF w/ multi DAT matches : {multiple_matched_dat_files}\n")
-        debug_log.write(f"=======================================================\n")
-        debug_log.write("\n")
-        debug_log.flush()
-        debug_log.close()
+        try:
+            start_fmt = start_time.strftime("%-m/%-d/%Y %H:%M:%S")
+            end_fmt = end_time.strftime("%-m/%-d/%Y %H:%M:%S")
+        except ValueError:
+            start_fmt = start_time.strftime("%#m/%#d/%Y %H:%M:%S")
+            end_fmt = end_time.strftime("%#m/%#d/%Y %H:%M:%S")
+
+        if any_processed:
+            print("\n=======================================================")
+            print(f"Cache Copy started at :          | {start_fmt}")
+            print(f"Cache Copy ended at :            | {end_fmt}")
+            print(f"Duration :                       | {format_duration(duration_secs)}")
+            print(f"Total files copied :             | {copied_count}")
+            print(f"Total corrupt files copied :     | {corrupt_count}")
+            print(f"Total modified files copied :    | {modified_count}")
+            print(f"Total dupes :                    | {dupe_count}")
+            print(f"Total INF w/ multi DAT matches : | {multiple_matched_dat_files}")
+            print("=======================================================\n")
+
+        if DEBUG_ENABLED and any_processed:
+            debug_log.write("\n=======================================================\n")
+            debug_log.write(f"Cache Copy started at :          {start_fmt}\n")
+            debug_log.write(f"Cache Copy ended at :            {end_fmt}\n")
+            debug_log.write(f"Duration :                       {format_duration(duration_secs)}\n")
+            debug_log.write(f"Total files copied :             {copied_count}\n")
+            debug_log.write(f"Total corrupt files copied :     {corrupt_count}\n")
+            debug_log.write(f"Total modified files copied :    {modified_count}\n")
+            debug_log.write(f"Total dupes :                    {dupe_count}\n")
+            debug_log.write(f"Total INF w/ multi DAT matches : {multiple_matched_dat_files}\n")
+            debug_log.write(f"=======================================================\n")
+            debug_log.write("\n")
+            debug_log.flush()
+
+    ARCHIVE_MANIFEST = ArchiveManifest(Path(archive_root) / "ARCHIVE")
+    ANALYSIS_CACHE = AnalysisCache(Path(archive_root) / ANALYSIS_CACHE_NAME, invalidate=REANALYZE)
+    VERDICT_MEMO = VerdictMemo(ANALYSIS_CACHE)
+    cdnfiles_log = DateLog(cdnfiles_file)
+    dcfiles_log = DateLog(dcfiles_file, strip_lines=True)
+
+    pool = None
+    if JOBS > 1:
+        pool = ProcessPoolExecutor(max_workers=JOBS, initializer=init_analysis_worker, initargs=(CUSTOM_QUERY_MODE, VIDEO_PROBE_MODE, VIDEO_TIMEOUT, IMAGE_CHECK_MODE, str(Path(archive_root) / ANALYSIS_CACHE_NAME)))
+
+    if cachelist_file:
+        # Every (cache name, search root) pair in one process, logs_ALL is read once
+        lines_by_cache = {}
+        with open(inf_file_path, encoding='utf-8') as f:
+            for line in f:
+                parts = line.rstrip('\r\n').split('|')
+                if len(parts) >= 4:
+                    lines_by_cache.setdefault(parts[3].strip().lower(), []).append(line)
+
+        for list_cachename, list_search_root in read_cache_list(cachelist_file):
+            queryname = cachename = list_cachename
+            search_root = list_search_root
+            copy_cache(lines_by_cache.get(cachename.lower(), []), datetime.now(), pool)
+    else:
+        with open(inf_file_path, encoding='utf-8') as f:
+            copy_cache(f, start_time, pool)
+
+    if pool is not None:
+        pool.shutdown()
 
-    if OVERRIDE_NEW_MODE and OVERRIDE_NEW_LOG:
-        OVERRIDE_NEW_LOG.close()
+    ARCHIVE_MANIFEST.close()
+    ANALYSIS_CACHE.close()
+    RUN_LOGS.close()
+    sort_dupes_file_by_target_path(dupes_file)
+    if debug_log is not None:
+        debug_log.close()
@@ -1,23 +1,41 @@
 import os
-import shutil
-import subprocess
 import sys
-import hashlib
 import logging
-import re
 from pathlib import Path
 from datetime import datetime
-from PIL import Image, UnidentifiedImageError
+from dat_index import build_dat_index, find_dat_files
+from archive_manifest import ArchiveManifest
+from video_probe import TIMEOUT_VERDICT, VIDEO_PROBE_MODES, default_video_timeout, probe_video
+from image_check import is_image_corrupt
+from xml_check import is_xml_corrupt
+from file_probe import FileProbe
+from file_fingerprint import partial_fingerprint
+from analysis_cache import AnalysisCache, VerdictMemo, CACHE_NAME as ANALYSIS_CACHE_NAME
+from run_logs import RunLogWriter
+from file_placement import LINK_MODES, place_file
+from dir_snapshot import DirSnapshot
 
 DEBUG_ENABLED = False
 VERBOSE_MODE = False
 CUSTOM_QUERY_MODE = False
 OVERRIDE_MODE = "0"
+LINK_MODE = "copy"
+VIDEO_PROBE_MODE = "full"
+VIDEO_TIMEOUT = None
+IMAGE_CHECK_MODE = "fast"
 copied_count = 0
 corrupt_count = 0
 modified_count = 0
 dupe_count = 0
 multiple_matched_dat_files = 0
+ARCHIVE_MANIFEST = None
+ANALYSIS_CACHE = None
+VERDICT_MEMO = None
+REANALYZE = False
+RUN_LOGS = RunLogWriter()
+ARCHIVE_SNAPSHOT = DirSnapshot()
+# Archive targets are only ever compared by content and size
+TARGET_FIELDS = {'sha1', 'size'}
 
 FOLDER_RENAMES = {
     "scee": "scee-home.playstation.net",
@@ -52,60 +70,6 @@ def get_file_extension(file_path):
     _, file_extension = os.path.splitext(file_path)
     return file_extension
 
-def get_file_size(file_path):
-    try:
-        return os.path.getsize(file_path)
-    except Exception as e:
-        dbg("Error getting file size: %s", e)
-        return -1
-
-def get_sdata_version(file_path, file_size):
-    if not file_path.lower().endswith('.sdat'):
-        return "NA"
-
-    if file_size < 16:
-        return "0"
-
-    version_signatures = {
-        b"SDATA 4.0.0.W\x00\x00\x00": "4.0",
-        b"SDATA 2.4.0.W\x00\x00\x00": "2.4",
-        b"SDATA 2.2.0.W\x00\x00\x00": "2.2",
-        b"SDATA 3.3.0.W\x00\x00\x00": "3.3",
-    }
-
-    try:
-        with open(file_path, 'rb') as file:
-            file.seek(-16, 2)
-            end_bytes = file.read(16)
-            for signature, version in version_signatures.items():
-                if end_bytes == signature:
-                    return version
-            return "0"
-    except Exception as e:
-        dbg("Error checking SDATA version: %s", e)
-        return "ERROR"
-
-def calculate_sha1(file_path):
-    try:
-        sha1 = hashlib.sha1()
-        with open(file_path, 'rb') as f:
-            while chunk := f.read(65536):
-                sha1.update(chunk)
-        return sha1.hexdigest().upper()
-    except Exception as e:
-        dbg("Error calculating SHA1: %s", e)
-        return "ERROR"
-
-def is_image_corrupt(filepath):
-    try:
-        with Image.open(filepath) as img:
-            img.verify()
-        with Image.open(filepath) as img:
-            img.load()
-    except (IOError, SyntaxError, UnidentifiedImageError, ValueError, AttributeError):
-        return 1
-    return 0
-
 SPECIFIC_ERRORS = [
     "moov atom not found",
     "contradictory STSC and STCO",
@@ -120,8 +84,15 @@ SPECIFIC_ERRORS = [
     "partial file"
 ]
 
+# While a source file is analysed its video log lines are collected here instead of
+# being logged, so they can be cached and replayed on later runs
+_captured_video_log = None
+
 def log_and_print(message, log_only=True):
-    logging.info(message)
+    if _captured_video_log is not None:
+        _captured_video_log.append(message)
+    else:
+        logging.info(message)
 
 def extract_error_summary(output):
     detailed_lines = []
@@ -132,28 +103,54 @@ def extract_error_summary(output):
                     detailed_lines.append(line)
     return detailed_lines
 
-def analyze_video(file_path, ffprobe_path, log_path=None, inf_url=None):
+INPUT_MARKER = "\x00input\x00"
+
+def memoized_verdict(sha1, kind, compute):
+    if VERDICT_MEMO is None or not sha1 or sha1 == "ERROR":
+        return compute()
+    verdict = VERDICT_MEMO.get(sha1, kind)
+    if verdict is None:
+        verdict = compute()
+        if verdict is not None:
+            VERDICT_MEMO.put(sha1, kind, verdict)
+    return verdict
+
+def setup_video_log(log_path):
+    logger = logging.getLogger()
+    if not logger.hasHandlers():
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        logging.basicConfig(filename=log_path, level=logging.INFO, format='%(message)s')
+
+def analyze_video(file_path, ffprobe_path, log_path=None, inf_url=None, sha1=None):
     def log_if_corrupt(detailed_lines, log_path):
         if not detailed_lines or not log_path:
             return False
-        logger = logging.getLogger()
-        if not logger.hasHandlers():
-            os.makedirs(os.path.dirname(log_path), exist_ok=True)
-            logging.basicConfig(filename=log_path, level=logging.INFO, format='%(message)s')
+        setup_video_log(log_path)
         return True
 
-    cmd = [
-        ffprobe_path,
-        '-v', 'error',
-        '-show_entries', 'format',
-        '-show_entries', 'stream',
-        '-show_entries', 'frame',
-        '-print_format', 'json',
-        file_path
-    ]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    detailed_lines = extract_error_summary(result.stderr)
+    def probe():
+        stderr = probe_video(file_path, ffprobe_path, VIDEO_PROBE_MODE, VIDEO_TIMEOUT)
+        if stderr is None:
+            return None
+        # ffprobe names its input in the messages, keep them valid for every identical copy
+        return [line.replace(file_path, INPUT_MARKER) for line in extract_error_summary(stderr)]
+
+    # The error lines are memoised, the log entry itself is still written per file
+    kind = 'video' if VIDEO_PROBE_MODE == "full" else f"video-{VIDEO_PROBE_MODE}"
+    detailed_lines = memoized_verdict(sha1, kind, probe)
+
+    if detailed_lines is None:
+        dbg("ffprobe timed out after %ss on %s", VIDEO_TIMEOUT, file_path)
+        if log_path:
+            setup_video_log(log_path)
+            if inf_url:
+                log_and_print(f"{inf_url}")
+            log_and_print(f"{os.path.relpath(file_path, os.getcwd())}:")
+            log_and_print(f"ffprobe timed out after {VIDEO_TIMEOUT}s")
+            log_and_print("-----------------------------------------------")
+        return TIMEOUT_VERDICT
 
+    detailed_lines = [line.replace(INPUT_MARKER, file_path) for line in detailed_lines]
     if detailed_lines:
         relative_path = os.path.relpath(file_path, os.getcwd())
         if log_if_corrupt(detailed_lines, log_path):
@@ -175,80 +172,57 @@ XML_ENCRYPTED = {
     "SceneList.xml"
 }
 
-ROOT_TAGS = [
-    "commerce_point", "XML", "xml", "REGIONINFO", "rss", "RSS", "LOCALISATION",
-    "eula", "active_objects", "videos", "media", "WEATHER", "TICKER"
-]
-
-XML_PATTERNS = {
-    tag.lower(): (
-        re.compile(rf"<\s*{tag.lower()}\b[^>]*\/\s*>", re.IGNORECASE),  # self-closing
-        re.compile(rf"<\s*{tag.lower()}\b[^>]*>", re.IGNORECASE),       # open
-        re.compile(rf"</\s*{tag.lower()}\s*>", re.IGNORECASE),          # close
-    )
-    for tag in ROOT_TAGS
-}
-
-def is_xml_corrupt(filepath):
-    try:
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            content_lower = f.read().lower()
-
-        for tag_lc, (self_close, open_tag, close_tag) in XML_PATTERNS.items():
-            if self_close.search(content_lower):
-                return 0
-            if open_tag.search(content_lower) and close_tag.search(content_lower):
-                return 0
-            elif open_tag.search(content_lower):
-                return 1
-        return 0
-    except Exception:
-        return 1
-
 # === FILE ANALYSIS FUNCTIONS END ===
 
-def get_file_info(file_path, ffprobe_path, archive_root, queryname, cachename, inf_url=None, special_path=None):
+def video_log_path(archive_root, queryname, cachename):
+    if CUSTOM_QUERY_MODE:
+        return os.path.join(archive_root, "ARCHIVE", queryname, cachename, "log_VIDEO_ANALYSIS.log")
+    return os.path.join(archive_root, "ARCHIVE", "log_VIDEO_ANALYSIS.log")
+
+def get_file_info(file_path, ffprobe_path, archive_root, queryname, cachename, inf_url=None, special_path=None, fields=None):
+    # fields limits the work to the listed keys ('ext' is always returned), None computes everything
     ext = get_file_extension(file_path)
     ext_lc = ext.lower()
     
-    size = get_file_size(file_path)
-    
+    # One read gives size, SDATA trailer and the SHA1, which comes first so the verdicts
+    # below can be shared between identical copies
+    probe = FileProbe(file_path, sha1=fields is None or 'sha1' in fields)
+    if probe.error is not None:
+        dbg("Error reading %s: %s", file_path, probe.error)
+    size = probe.size
+    sha1 = probe.sha1
+
     sdatver = -1
-    if ext_lc == '.sdat':
-        ver = get_sdata_version(file_path, size)
+    if ext_lc == '.sdat' and (fields is None or 'sdatver' in fields):
+        ver = probe.sdata_version()
         try:
             sdatver = float(ver)
         except (ValueError, TypeError):
             sdatver = -1
 
-    sha1 = calculate_sha1(file_path)
-
     imgcor = "NA"
-    if ext_lc in ['.png', '.jpg', '.jpeg', '.dds']:
-        imgcor = is_image_corrupt(file_path)
+    if ext_lc in ['.png', '.jpg', '.jpeg', '.dds'] and (fields is None or 'imgcor' in fields):
+        kind = 'image' if IMAGE_CHECK_MODE == "strict" else f"image-{IMAGE_CHECK_MODE}"
+        imgcor = memoized_verdict(sha1, kind, lambda: is_image_corrupt(file_path, IMAGE_CHECK_MODE))
 
     vidcor = "NA"
-    if ext_lc in ['.mp4', '.m4v']:
+    if ext_lc in ['.mp4', '.m4v'] and (fields is None or 'vidcor' in fields):
         if not os.path.exists(ffprobe_path):
             dbg("Warning: ffprobe path is invalid or missing: %s", ffprobe_path)
             vidcor = -1
         else:
-            if CUSTOM_QUERY_MODE:
-                log_path = os.path.join(archive_root, "ARCHIVE", queryname, cachename, "log_VIDEO_ANALYSIS.log")
-            else:
-                log_path = os.path.join(archive_root, "ARCHIVE", "log_VIDEO_ANALYSIS.log")
-
-            vidcor = analyze_video(file_path, ffprobe_path, log_path=log_path, inf_url=inf_url)
+            log_path = video_log_path(archive_root, queryname, cachename)
+            vidcor = analyze_video(file_path, ffprobe_path, log_path=log_path, inf_url=inf_url, sha1=sha1)
 
     xmlcor = "NA"
-    if ext_lc == '.xml':
+    if ext_lc == '.xml' and (fields is None or 'xmlcor' in fields):
         fname = Path(special_path).name if special_path else Path(file_path).name
         if fname.lower() in (name.lower() for name in XML_ENCRYPTED):
             xmlcor = 0
         else:
-            xmlcor = is_xml_corrupt(file_path)
+            xmlcor = memoized_verdict(sha1, 'xml', lambda: is_xml_corrupt(file_path))
         
-    return {
+    info = {
         'ext': ext,
         'size': size,
         'sdatver': sdatver,
@@ -257,7 +231,80 @@ def get_file_info(file_path, ffprobe_path, archive_root, queryname, cachename, i
         'vidcor': vidcor if vidcor != "NA" else -1,
         'xmlcor': xmlcor if xmlcor != "NA" else -1
     }
-
+    if fields is not None:
+        info = {k: v for k, v in info.items() if k == 'ext' or k in fields}
+    return info
+
+
+def get_target_info(file_path, ffprobe_path, archive_root, queryname, cachename, sha1=True):
+    # With sha1=False only the size is needed, so a target without a manifest entry is
+    # not hashed; its info then has no 'sha1' key until a later call asks for one
+    info = ARCHIVE_SNAPSHOT.info(file_path)
+    if info is not None and (not sha1 or 'sha1' in info):
+        return info
+    cached = ARCHIVE_MANIFEST.lookup(file_path) if ARCHIVE_MANIFEST is not None else None
+    if cached:
+        dbg("[MANIFEST] Using recorded SHA1 for %s", file_path)
+        info = {'ext': get_file_extension(str(file_path)), 'size': cached['size'], 'sha1': cached['sha1']}
+    else:
+        fields = TARGET_FIELDS if sha1 else {'size'}
+        info = get_file_info(str(file_path), ffprobe_path, archive_root, queryname, cachename, fields=fields)
+        if ARCHIVE_MANIFEST is not None and info and sha1:
+            ARCHIVE_MANIFEST.record(file_path, info['sha1'])
+    if info:
+        ARCHIVE_SNAPSHOT.remember(file_path, info)
+    return info
+
+def matches_target(src, size, sha1, target, ffprobe_path, archive_root, queryname, cachename):
+    # Whether the archived target holds the same bytes as src. Sizes are compared first,
+    # then a partial fingerprint of both files, and only when those agree is the target's
+    # full SHA1 computed (and recorded in the manifest) to compare with src's
+    info = get_target_info(str(target), ffprobe_path, archive_root, queryname, cachename, sha1=False)
+    if not info or info['size'] != size:
+        return False
+    if 'sha1' not in info and partial_fingerprint(src) != partial_fingerprint(target):
+        return False
+    return get_target_info(str(target), ffprobe_path, archive_root, queryname, cachename)['sha1'] == sha1
+
+def analysis_context(inf_url, special_path):
+    return f"{inf_url}|{special_path}|{VIDEO_PROBE_MODE}|{IMAGE_CHECK_MODE}"
+
+def is_cacheable_analysis(info):
+    # Inconclusive results are not stored so the file gets checked again next run: a
+    # timeout may be transient, and a video gets vidcor -1 only when ffprobe is missing
+    if not info or info['sha1'] == "ERROR" or info['size'] == -1:
+        return False
+    if info['vidcor'] == TIMEOUT_VERDICT:
+        return False
+    return not (info['ext'].lower() in ('.mp4', '.m4v') and info['vidcor'] == -1)
+
+def get_source_info(file, ffprobe_path, archive_root, queryname, cachename, inf_url, special_path):
+    global _captured_video_log
+    context = analysis_context(inf_url, special_path)
+    cached = ANALYSIS_CACHE.lookup(str(file), "cache_copy", context) if ANALYSIS_CACHE is not None else None
+    if cached is not None:
+        dbg("[ANALYSIS CACHE] Using cached analysis for %s", file)
+        info, video_log = cached['info'], cached['video_log']
+    else:
+        _captured_video_log = []
+        try:
+            info = get_file_info(str(file), ffprobe_path, archive_root, queryname, cachename, inf_url=inf_url, special_path=special_path)
+            video_log = _captured_video_log
+        finally:
+            _captured_video_log = None
+        if ANALYSIS_CACHE is not None and is_cacheable_analysis(info):
+            ANALYSIS_CACHE.store(str(file), "cache_copy", {'info': info, 'video_log': video_log}, context)
+    if video_log:
+        setup_video_log(video_log_path(archive_root, queryname, cachename))
+        for message in video_log:
+            log_and_print(message)
+    return info
+
+def rename_archived(src, dst):
+    Path(src).rename(dst)
+    if ARCHIVE_MANIFEST is not None:
+        ARCHIVE_MANIFEST.rename(src, dst)
+    ARCHIVE_SNAPSHOT.rename(src, dst)
 
 def ensure_dir(path):
     dbg("Ensuring directory exists: %s", path)
@@ -273,7 +320,7 @@ def construct_full_target_path(archive_root, queryname, cachename, special_path)
     dbg("Constructed full target path: %s", full_path)
     return full_path
 
-def copy_file(src, dst, message=""):
+def copy_file(src, dst, message="", sha1=None):
     global copied_count
     dbg("Copying from %s to %s", src, dst)
 
@@ -281,7 +328,16 @@ def copy_file(src, dst, message=""):
         log_line = f"[VERBOSE] COPIED {copied_count + 1} {message}"
     else:
         ensure_dir(os.path.dirname(dst))
-        shutil.copy2(src, dst)
+        # The copy reads src again; its digest verifies the analysis SHA1 against the
+        # bytes actually written rather than saving a read
+        _, written_sha1 = place_file(src, dst, LINK_MODE)
+        if written_sha1:
+            if sha1 and written_sha1 != sha1:
+                print(f"WARNING: {src} changed after it was analysed ( {sha1} -> {written_sha1} )")
+            sha1 = written_sha1
+        if ARCHIVE_MANIFEST is not None:
+            ARCHIVE_MANIFEST.record(dst, sha1)
+        ARCHIVE_SNAPSHOT.add(dst)
         log_line = f"COPIED {copied_count + 1} {message}"
 
     copied_count += 1
@@ -302,34 +358,33 @@ def incremental_copy(src, dst, override, ffprobe_path):
 
     if override == "1":
         dbg("Override is 1, using original path: %s", original_target)
-        cor_old = {'fileext': '', 'filesize': -1, 'sha1': ''}
-        if original_target.exists():
-            info = get_file_info(str(original_target), ffprobe_path, archive_root, queryname, cachename)
+        cor_old = {'fileext': '', 'filesize': -1}
+        if ARCHIVE_SNAPSHOT.exists(original_target):
+            info = get_target_info(str(original_target), ffprobe_path, archive_root, queryname, cachename, sha1=False)
             if info:
                 cor_old = {
                     'fileext': info['ext'],
-                    'filesize': info['size'],
-                    'sha1': info['sha1']
+                    'filesize': info['size']
                 }
         return str(original_target), cor_old
 
-    if not original_target.exists():
+    if not ARCHIVE_SNAPSHOT.exists(original_target):
         dbg("Original target doesn't exist, using it directly: %s", original_target)
-        return str(original_target), {'fileext': '', 'filesize': -1, 'sha1': ''}
+        return str(original_target), {'fileext': '', 'filesize': -1}
 
     dbg("Finding unique target for duplicate: %s", original_target)
     counter = -1
     while True:
         candidate = dir_name / f"{base}{counter}{ext}"
-        if not candidate.exists():
+        if not ARCHIVE_SNAPSHOT.exists(candidate):
             break
         counter -= 1
 
     final_target = dir_name / f"{base}{counter}{ext}"
     dbg("Using fallback path: %s", final_target)
-    return str(final_target), {'fileext': '', 'filesize': -1, 'sha1': ''}
+    return str(final_target), {'fileext': '', 'filesize': -1}
 
-def process_inf_line(line, archive_root, search_root, queryname, cachename, ffprobe_path, nofileforinf_file, dupes_file):
+def process_inf_line(line, archive_root, search_root, queryname, cachename, ffprobe_path, nofileforinf_file, dupes_file, dat_index):
     global copied_count, corrupt_count, modified_count, dupe_count, multiple_matched_dat_files
     dbg("Processing line: %s", line.strip())
     parts = line.strip().split('|')
@@ -437,7 +492,7 @@ def process_inf_line(line, archive_root, search_root, queryname, cachename, ffpr
 
     special_path = inf_url.strip('/')
     dbg("Searching for %s_DAT*", c)
-    dat_files = [f for f in Path(search_root).rglob(f"{c}_DAT*") if f.is_file()]
+    dat_files = find_dat_files(dat_index, c)
     dbg("Found %d file(s) for %s_DAT*", len(dat_files), c)
 
     if len(dat_files) > 1:
@@ -445,35 +500,30 @@ def process_inf_line(line, archive_root, search_root, queryname, cachename, ffpr
 
     if not dat_files:
         dbg("No DAT files found for %s, logging to nofiles", c)
-        with open(nofileforinf_file, 'a', encoding='utf-8', errors='ignore') as nf:
-            nf.write(f"{cachename}\t{c}_INF\t{special_path}\n")
+        RUN_LOGS.write(nofileforinf_file, f"{cachename}\t{c}_INF\t{special_path}\n")
         return
 
     for file in dat_files:
         dbg("Analyzing file: %s", file)
     
         if file.suffix == "":
-             try:
-                 with open(file, 'r', encoding='utf-8', errors='ignore') as f:
-                     chunk = f.read(2048).strip()
-                 chunk_lower = chunk.lower()
-         
-                 if chunk.startswith('{') or chunk.startswith('['):
-                     if not inf_url.endswith('.json'):
-                         inf_url += ".json"
-                         special_path += ".json"
-                         dbg("[EXTENSIONLESS] Patched path .json : %s", file)
-                 elif chunk.startswith('<'):
-                     if '<xml' in chunk_lower or any(tag in chunk_lower for tag in ['<?xml', '<rss', '<profile']):
-                         if not inf_url.endswith('.xml'):
-                             inf_url += ".xml"
-                             special_path += ".xml"
-                             dbg("[EXTENSIONLESS] Patched path with .xml : %s", file)
-             except Exception as e:
-                 dbg("Failed to detect type for extensionless file %s: %s", file, e)
+             probe = FileProbe(file, sha1=False)
+             sniffed = probe.sniff_type()
+             if probe.error is not None:
+                 dbg("Failed to detect type for extensionless file %s: %s", file, probe.error)
+             elif sniffed == "json":
+                 if not inf_url.endswith('.json'):
+                     inf_url += ".json"
+                     special_path += ".json"
+                     dbg("[EXTENSIONLESS] Patched path .json : %s", file)
+             elif sniffed == "xml":
+                 if not inf_url.endswith('.xml'):
+                     inf_url += ".xml"
+                     special_path += ".xml"
+                     dbg("[EXTENSIONLESS] Patched path with .xml : %s", file)
     
         normal_target = construct_full_target_path(archive_root, queryname, cachename, special_path)
-        info = get_file_info(str(file), ffprobe_path, archive_root, queryname, cachename, inf_url=inf_url, special_path=special_path)
+        info = get_source_info(file, ffprobe_path, archive_root, queryname, cachename, inf_url, special_path)
         if not info:
             dbg("Skipping file %s due to failed info retrieval", file)
             continue
@@ -487,7 +537,7 @@ def process_inf_line(line, archive_root, search_root, queryname, cachename, ffpr
         if size == 0:
             corrupt_target = construct_full_target_path(archive_root, queryname, cachename, f"corrupted/{special_path}")
             final_target, _ = incremental_copy(str(file), str(corrupt_target), OVERRIDE_MODE, ffprobe_path)
-            copy_file(file, final_target, f"{cachename}/corrupted/{special_path} - CORRUPT ( 0 BYTES )")
+            copy_file(file, final_target, f"{cachename}/corrupted/{special_path} - CORRUPT ( 0 BYTES )", sha1=sha1)
             corrupt_count += 1
             return
 
@@ -498,38 +548,37 @@ def process_inf_line(line, archive_root, search_root, queryname, cachename, ffpr
 
             corrupt_target = construct_full_target_path(archive_root, queryname, cachename, f"corrupted/{special_path}")
             final_target, cor_old = incremental_copy(str(file), str(corrupt_target), OVERRIDE_MODE, ffprobe_path)
-            if cor_old['sha1'] and cor_old['filesize'] >= 0:
-                if sha1 != cor_old['sha1'] and size > cor_old['filesize']:
-                    copy_file(file, final_target, f"{cachename}/corrupted/{special_path} - CORRUPT ( NEW FILE SIZE )")
+            if cor_old['filesize'] >= 0:
+                if size > cor_old['filesize']:
+                    copy_file(file, final_target, f"{cachename}/corrupted/{special_path} - CORRUPT ( NEW FILE SIZE )", sha1=sha1)
                     corrupt_count += 1
                     return
             else:
-                copy_file(file, final_target, f"{cachename}/corrupted/{special_path} - CORRUPT")
+                copy_file(file, final_target, f"{cachename}/corrupted/{special_path} - CORRUPT", sha1=sha1)
                 corrupt_count += 1
                 return
 
         elif sdatver == 3.3:
             mod_target = construct_full_target_path(archive_root, queryname, cachename, f"modified/{special_path}")
             final_target, cor_old = incremental_copy(str(file), str(mod_target), OVERRIDE_MODE, ffprobe_path)
-            if sha1 != cor_old['sha1']:
-                copy_file(file, final_target, f"{cachename}/modified/{special_path} - MODIFIED SDAT")
+            if cor_old['filesize'] < 0 or not matches_target(file, size, sha1, final_target, ffprobe_path, archive_root, queryname, cachename):
+                copy_file(file, final_target, f"{cachename}/modified/{special_path} - MODIFIED SDAT", sha1=sha1)
                 modified_count += 1
             return
 
-        if normal_target.exists():
-            old_info = get_file_info(str(normal_target), ffprobe_path, archive_root, queryname, cachename)
-            if old_info and old_info['sha1'] == sha1:
+        if ARCHIVE_SNAPSHOT.exists(normal_target):
+            if matches_target(file, size, sha1, normal_target, ffprobe_path, archive_root, queryname, cachename):
                 relative_path = Path(file).relative_to(search_root).as_posix()
                 dat_line = f"{cachename}\t{cachename}/{relative_path}\t{special_path}\n"
-                with open(dupes_file, 'a', encoding='utf-8', errors='ignore') as dup:
-                    dup.write(dat_line)
+                RUN_LOGS.write(dupes_file, dat_line)
                 dupe_count += 1
                 return
-            else:
+            elif DEBUG_ENABLED:
+                old_info = get_target_info(str(normal_target), ffprobe_path, archive_root, queryname, cachename)
                 dbg("[SHA1-MISMATCH] Existing target: %s | New SHA1: %s | Old SHA1: %s", normal_target, sha1, old_info['sha1'])
 
         final_target, _ = incremental_copy(str(file), str(normal_target), OVERRIDE_MODE, ffprobe_path)
-        copy_file(file, final_target, f"{cachename}/{special_path}")
+        copy_file(file, final_target, f"{cachename}/{special_path}", sha1=sha1)
 
 def format_duration(seconds):
     if seconds < 60:
@@ -579,6 +628,32 @@ if __name__ == '__main__':
         DEBUG_ENABLED = True
         sys.argv.remove('--debug')
 
+    if '--link-mode' in sys.argv:
+        idx = sys.argv.index('--link-mode')
+        if idx + 1 >= len(sys.argv) or sys.argv[idx + 1] not in LINK_MODES:
+            print(f"Error: --link-mode requires one of: {', '.join(LINK_MODES)}")
+            sys.exit(1)
+        LINK_MODE = sys.argv[idx + 1]
+        del sys.argv[idx:idx + 2]
+
+    if '--video-probe' in sys.argv:
+        idx = sys.argv.index('--video-probe')
+        if idx + 1 >= len(sys.argv) or sys.argv[idx + 1] not in VIDEO_PROBE_MODES:
+            print(f"Error: --video-probe requires one of: {', '.join(VIDEO_PROBE_MODES)}")
+            sys.exit(1)
+        VIDEO_PROBE_MODE = sys.argv[idx + 1]
+        del sys.argv[idx:idx + 2]
+
+    if '--video-timeout' in sys.argv:
+        idx = sys.argv.index('--video-timeout')
+        if idx + 1 >= len(sys.argv) or not sys.argv[idx + 1].isdigit():
+            print("Error: --video-timeout requires a number of seconds (0 = no limit)")
+            sys.exit(1)
+        VIDEO_TIMEOUT = int(sys.argv[idx + 1]) or None
+        del sys.argv[idx:idx + 2]
+    else:
+        VIDEO_TIMEOUT = default_video_timeout(VIDEO_PROBE_MODE)
+
     for arg in sys.argv[9:]:
         if arg == "--skipincrcopy":
             OVERRIDE_MODE = "1"
@@ -586,9 +661,13 @@ if __name__ == '__main__':
             VERBOSE_MODE = True
         elif arg == "--customquery":
             CUSTOM_QUERY_MODE = True
+        elif arg == "--reanalyze":
+            REANALYZE = True
+        elif arg == "--strict-images":
+            IMAGE_CHECK_MODE = "strict"
 
     if len(sys.argv) < 9:
-        print("Usage: cache_copy_single.py <archive_root> <queryname> <cachename> <search_root> <inf_file_path> <ffprobe_path> <dupes_logfile_path> <nofileforinf_logfile_path> [--customquery] [--skipincrcopy] [--verbose] [--debug]")
+        print("Usage: cache_copy_single.py <archive_root> <queryname> <cachename> <search_root> <inf_file_path> <ffprobe_path> <dupes_logfile_path> <nofileforinf_logfile_path> [--customquery] [--skipincrcopy] [--verbose] [--debug] [--link-mode {copy,hardlink,reflink,auto}] [--video-probe {full,triage}] [--video-timeout SECONDS] [--strict-images] [--reanalyze]")
         sys.exit(1)
 
     archive_root = sys.argv[1]
@@ -610,8 +689,15 @@ if __name__ == '__main__':
         os.makedirs(debug_log_path.parent, exist_ok=True)
         debug_log = open(debug_log_path, 'w', encoding='utf-8', buffering=1)
 
+    ARCHIVE_MANIFEST = ArchiveManifest(Path(archive_root) / "ARCHIVE")
+    ANALYSIS_CACHE = AnalysisCache(Path(archive_root) / ANALYSIS_CACHE_NAME, invalidate=REANALYZE)
+    VERDICT_MEMO = VerdictMemo(ANALYSIS_CACHE)
+
     dbg("Starting processing with inf file: %s", inf_file_path)
 
+    dbg("Indexing DAT files under: %s", search_root)
+    dat_index = build_dat_index(search_root)
+
     with open(inf_file_path, encoding='utf-8') as file:
         for line in file:
             process_inf_line(
@@ -622,9 +708,13 @@ if __name__ == '__main__':
                 cachename,
                 ffprobe_path,
                 nofileforinf_file,
-                dupes_file
+                dupes_file,
+                dat_index
             )
 
+    ARCHIVE_MANIFEST.close()
+    ANALYSIS_CACHE.close()
+    RUN_LOGS.close()
     sort_dupes_file_by_target_path(dupes_file)
 
     end_time = datetime.now()
@@ -0,0 +1,44 @@
+import os
+from pathlib import Path
+
+DAT_MARKER = os.path.normcase("_DAT")
+
+def _index_names(index, dirpath, entries):
+    for entry in entries:
+        try:
+            if not entry.is_file():
+                continue
+        except OSError:
+            continue
+        name = os.path.normcase(entry.name)
+        # Register the file under every prefix that "<hash>_DAT*" could match
+        pos = name.find(DAT_MARKER)
+        while pos != -1:
+            index.setdefault(name[:pos], []).append(os.path.join(dirpath, entry.name))
+            pos = name.find(DAT_MARKER, pos + 1)
+
+def build_dat_index(search_root):
+    # Same traversal order as Path(search_root).rglob("<hash>_DAT*"): files of a
+    # directory first, then each subdirectory in scandir order, symlinked dirs skipped.
+    index = {}
+    stack = [str(Path(search_root))]
+    while stack:
+        dirpath = stack.pop()
+        try:
+            with os.scandir(dirpath) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        _index_names(index, dirpath, entries)
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir() and not entry.is_symlink():
+                    subdirs.append(entry.path)
+            except OSError:
+                continue
+        stack.extend(reversed(subdirs))
+    return index
+
+def find_dat_files(dat_index, hashval):
+    return [Path(p) for p in dat_index.get(os.path.normcase(hashval), [])]
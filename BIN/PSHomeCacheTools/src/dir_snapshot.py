@@ -0,0 +1,53 @@
+import os
+
+class DirSnapshot:
+    # In-memory listing of archive target directories. Each directory is read once with
+    # scandir, then kept current by add()/remove()/rename() as this run copies and renames
+    # files, so slot probing (stem-1..N) costs no stat calls. Target info already looked up
+    # for a path is remembered until that path is written again.
+
+    def __init__(self):
+        self.dirs = {}
+        self.infos = {}
+
+    def _split(self, path):
+        dirpath, name = os.path.split(os.path.abspath(str(path)))
+        return os.path.normcase(dirpath), os.path.normcase(name)
+
+    def _names(self, dirpath):
+        names = self.dirs.get(dirpath)
+        if names is None:
+            try:
+                with os.scandir(dirpath) as it:
+                    names = {os.path.normcase(entry.name) for entry in it}
+            except OSError:
+                names = set()
+            self.dirs[dirpath] = names
+        return names
+
+    def exists(self, path):
+        dirpath, name = self._split(path)
+        return name in self._names(dirpath)
+
+    def add(self, path):
+        dirpath, name = self._split(path)
+        self._names(dirpath).add(name)
+        self.infos.pop(os.path.join(dirpath, name), None)
+
+    def remove(self, path):
+        dirpath, name = self._split(path)
+        self._names(dirpath).discard(name)
+        self.infos.pop(os.path.join(dirpath, name), None)
+
+    def rename(self, old_path, new_path):
+        info = self.info(old_path)
+        self.remove(old_path)
+        self.add(new_path)
+        if info is not None:
+            self.remember(new_path, info)
+
+    def info(self, path):
+        return self.infos.get(os.path.join(*self._split(path)))
+
+    def remember(self, path, info):
+        self.infos[os.path.join(*self._split(path))] = info
@@ -1,84 +1,24 @@
 import sys
+import atexit
 import os
-import hashlib
-import subprocess
 import logging
-from PIL import Image, UnidentifiedImageError
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from analysis_cache import AnalysisCache
+from video_probe import TIMEOUT_VERDICT, VIDEO_PROBE_MODES, default_video_timeout, probe_video
+from image_check import is_image_corrupt
+from file_probe import FileProbe
+
+ANALYSIS_CACHE = None
+VIDEO_PROBE_MODE = "full"
+VIDEO_TIMEOUT = None
+IMAGE_CHECK_MODE = "fast"
 
 def get_file_extension(file_path):
     _, file_extension = os.path.splitext(file_path)
     return file_extension
     
-def get_file_size(file_path):
-    try:
-        return os.path.getsize(file_path)
-    except Exception as e:
-        print(f"Error getting file size: {e}", file=sys.stderr)
-        return -1
-
-def get_sdata_version(file_path, file_size):
-    if not file_path.lower().endswith('.sdat'):
-        return "NA"
-
-    if file_size < 16:
-        return "0"
-    
-    version_signatures = {
-        b"SDATA 4.0.0.W\x00\x00\x00": "4.0",
-        b"SDATA 2.4.0.W\x00\x00\x00": "2.4",
-        b"SDATA 2.2.0.W\x00\x00\x00": "2.2",
-        b"SDATA 3.3.0.W\x00\x00\x00": "3.3",
-    }
-
-    try:
-        with open(file_path, 'rb') as file:
-            file.seek(-16, 2)
-            end_bytes = file.read(16)
-            for signature, version in version_signatures.items():
-                if end_bytes == signature:
-                    return version
-            return "0"
-    except Exception as e:
-        print(f"Error checking SDATA version: {e}", file=sys.stderr)
-        return "ERROR"
-
-def calculate_sha1(file_path):
-    try:
-        sha1 = hashlib.sha1()
-        with open(file_path, 'rb') as f:
-            while chunk := f.read(65536):
-                sha1.update(chunk)
-        return sha1.hexdigest().upper() 
-    except Exception as e:
-        print(f"Error calculating SHA1: {e}", file=sys.stderr)
-        return "ERROR"
-
-def check_file_for_missing_bytes(file_path):
-    try:
-        with open(file_path, 'rb') as file:
-            file.seek(0, 2) 
-            file_size = file.tell()
-            remainder = file_size % 16
-            if remainder != 0:
-                missing_bytes = 16 - remainder
-                return missing_bytes
-            else:
-                return 0
-    except Exception as e:
-        print(f"Error checking for missing bytes: {e}", file=sys.stderr)
-        return -1
-        
-        
-def is_image_corrupt(filepath):
-    try:
-        with Image.open(filepath) as img:
-            img.verify()  # Verifies the integrity of the file without loading it.
-        with Image.open(filepath) as img:
-            img.load()    # Attempt to load the image to catch deeper corruptions.
-    except (IOError, SyntaxError, UnidentifiedImageError, ValueError, AttributeError):
-        return 1  # Corrupt image
-    return 0  # Image is okay
-
 # List of specific errors to look for
 specific_errors = [
     "moov atom not found",
@@ -107,66 +47,235 @@ def extract_error_summary(output):
                     detailed_lines.append(line)
     return detailed_lines
 
-def analyze_video(file_path, ffprobe_path):
+def analyze_video(file_path, ffprobe_path, log=log_and_print):
     
-    cmd = [ffprobe_path, '-v', 'error', '-show_entries', 'format', '-show_entries', 'stream', '-show_entries', 'frame', '-print_format', 'json', file_path]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    stderr = probe_video(file_path, ffprobe_path, VIDEO_PROBE_MODE, VIDEO_TIMEOUT)
+    if stderr is None:
+        log(f"{os.path.relpath(file_path, os.getcwd())}:")
+        log(f"ffprobe timed out after {VIDEO_TIMEOUT}s")
+        log("-----------------------------------------------")
+        return TIMEOUT_VERDICT
     
-    detailed_lines = extract_error_summary(result.stderr)
+    detailed_lines = extract_error_summary(stderr)
     
     if detailed_lines:
         relative_path = os.path.relpath(file_path, os.getcwd())
-        log_and_print(f"{relative_path}:")
+        log(f"{relative_path}:")
         
         if len(detailed_lines) == 1 and "missing picture in access unit with size 5" in detailed_lines[0]:
-            log_and_print("Only error found is 'missing picture in access unit with size 5'. Skipping...")
-            log_and_print("-----------------------------------------------")
+            log("Only error found is 'missing picture in access unit with size 5'. Skipping...")
+            log("-----------------------------------------------")
             return 0  # Return 0 if this is the only error
 
         for line in detailed_lines:
-            log_and_print(f"{line}")
-        log_and_print("-----------------------------------------------")
+            log(f"{line}")
+        log("-----------------------------------------------")
         return 1  # Return 1 for other errors
 
     return 0  # Return 0 if no errors
 
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: file_analysis.exe <file_path> [ffprobe_path]", file=sys.stderr)
-        sys.exit(1)
-        
-    file_path = sys.argv[1]
+def default_ffprobe_path():
+    # Default ffprobe path within a "bin" directory in the current directory
+    return os.path.join(os.getcwd(), 'bin', 'ffprobe.exe')
+
+def analyze_file(file_path, ffprobe_path, log=log_and_print):
+    # Returns the 7-column TSV row for file_path, or None if any check errored
     file_extension = get_file_extension(file_path)
-    file_size = get_file_size(file_path)
-    sdata_version = get_sdata_version(file_path, file_size)
-    sha1 = calculate_sha1(file_path)
-    missing_bytes = check_file_for_missing_bytes(file_path)
+    probe = FileProbe(file_path)
+    if probe.error is not None:
+        print(f"Error reading file: {probe.error}", file=sys.stderr)
+    file_size = probe.size
+    sdata_version = probe.sdata_version() if file_path.lower().endswith('.sdat') else "NA"
+    sha1 = probe.sha1
+    missing_bytes = probe.missing_bytes()
     
     image_corruption_check = "NA"
     if file_extension.lower() in ['.png', '.jpg', '.jpeg', '.dds']:
-     image_corruption_check = is_image_corrupt(file_path)
+     image_corruption_check = is_image_corrupt(file_path, IMAGE_CHECK_MODE)
     
-    # Default ffprobe path within a "bin" directory in the current directory
-    current_dir = os.getcwd()
-    default_ffprobe_path = os.path.join(current_dir, 'bin', 'ffprobe.exe')
+    video_corruption_check = "NA"
+    if file_extension.lower() in ['.mp4', '.m4v']:
+        video_corruption_check = analyze_video(file_path, ffprobe_path, log=log)
+        
+    if any(check == -1 for check in [file_size, missing_bytes]) or any(check == "ERROR" for check in [sdata_version, sha1]):
+        return None
+
+    return f"{file_extension}\t{file_size}\t{sdata_version}\t{sha1}\t{missing_bytes}\t{image_corruption_check}\t{video_corruption_check}"
+
+def analyze_file_batch(file_path, ffprobe_path):
+    # Worker side of --batch: video log lines are handed back so the parent writes them in order
+    lines = []
+    return analyze_file(file_path, ffprobe_path, log=lines.append), lines
+
+def analysis_context():
+    # Cached rows are only reused when the video and image checks ran the same way
+    return f"{VIDEO_PROBE_MODE}|{IMAGE_CHECK_MODE}"
+
+def cached_analyze_file(file_path, ffprobe_path):
+    # analyze_file_batch through the --cache database, parent process only
+    if ANALYSIS_CACHE is not None:
+        cached = ANALYSIS_CACHE.lookup(file_path, "file_analysis", analysis_context())
+        if cached is not None:
+            return cached['row'], cached['video_log']
+    row, lines = analyze_file_batch(file_path, ffprobe_path)
+    store_analysis(file_path, row, lines)
+    return row, lines
+
+def store_analysis(file_path, row, lines):
+    # Timeouts may be transient, so those files get probed again next run
+    if ANALYSIS_CACHE is not None and row is not None and not row.endswith(f"\t{TIMEOUT_VERDICT}"):
+        ANALYSIS_CACHE.store(file_path, "file_analysis", {'row': row, 'video_log': lines}, analysis_context())
+
+def init_batch_worker(video_probe_mode, video_timeout, image_check_mode):
+    global VIDEO_PROBE_MODE, VIDEO_TIMEOUT, IMAGE_CHECK_MODE
+    VIDEO_PROBE_MODE = video_probe_mode
+    VIDEO_TIMEOUT = video_timeout
+    IMAGE_CHECK_MODE = image_check_mode
+
+def iter_batch_paths(source):
+    if source == "-":
+        for line in sys.stdin:
+            line = line.strip()
+            if line:
+                yield line
+    elif os.path.isdir(source):
+        for dirpath, dirnames, filenames in os.walk(source):
+            dirnames.sort()
+            for name in sorted(filenames):
+                yield os.path.join(dirpath, name)
+    else:
+        with open(source, encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+
+def run_batch(source, ffprobe_path, jobs):
+    # Same row as single-file mode with the file path appended as an 8th column, in input order.
+    # Files whose checks error are reported on stderr and make the exit code 1.
+    failed = False
+
+    def emit(file_path, row, lines):
+        nonlocal failed
+        if lines:
+            logging.basicConfig(filename='log_VIDEO_ANALYSIS.log', level=logging.INFO, format='%(message)s')
+        for line in lines:
+            logging.info(line)
+        if row is None:
+            print(f"Error analysing file: {file_path}", file=sys.stderr)
+            failed = True
+        else:
+            print(f"{row}\t{file_path}")
+
+    if jobs <= 1:
+        for file_path in iter_batch_paths(source):
+            emit(file_path, *cached_analyze_file(file_path, ffprobe_path))
+        return 1 if failed else 0
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_batch_worker, initargs=(VIDEO_PROBE_MODE, VIDEO_TIMEOUT, IMAGE_CHECK_MODE)) as pool:
+        pending = deque()
+
+        def emit_next():
+            done_path, result = pending.popleft()
+            if isinstance(result, tuple):
+                emit(done_path, *result)
+            else:
+                row, lines = result.result()
+                store_analysis(done_path, row, lines)
+                emit(done_path, row, lines)
+
+        for file_path in iter_batch_paths(source):
+            # Cache hits are queued as plain (row, lines) tuples so output order is kept
+            cached = ANALYSIS_CACHE.lookup(file_path, "file_analysis", analysis_context()) if ANALYSIS_CACHE is not None else None
+            if cached is not None:
+                pending.append((file_path, (cached['row'], cached['video_log'])))
+            else:
+                pending.append((file_path, pool.submit(analyze_file_batch, file_path, ffprobe_path)))
+            if len(pending) >= jobs * 4:
+                emit_next()
+        while pending:
+            emit_next()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+
+    if len(sys.argv) < 2:
+        print("Usage: file_analysis.exe <file_path> [ffprobe_path]", file=sys.stderr)
+        print("       file_analysis.exe --batch <directory|file_list|-> [ffprobe_path] [--jobs N]", file=sys.stderr)
+        print("       either form also takes [--cache <analysis_cache.db>] [--reanalyze] [--video-probe {full,triage}] [--video-timeout SECONDS] [--strict-images]", file=sys.stderr)
+        sys.exit(1)
+
+    reanalyze = '--reanalyze' in sys.argv
+    if reanalyze:
+        sys.argv.remove('--reanalyze')
+    if '--strict-images' in sys.argv:
+        IMAGE_CHECK_MODE = "strict"
+        sys.argv.remove('--strict-images')
+    if '--cache' in sys.argv:
+        idx = sys.argv.index('--cache')
+        if idx + 1 >= len(sys.argv):
+            print("Error: --cache requires a database path", file=sys.stderr)
+            sys.exit(1)
+        ANALYSIS_CACHE = AnalysisCache(sys.argv[idx + 1], invalidate=reanalyze)
+        atexit.register(ANALYSIS_CACHE.close)
+        del sys.argv[idx:idx + 2]
+    if '--video-probe' in sys.argv:
+        idx = sys.argv.index('--video-probe')
+        if idx + 1 >= len(sys.argv) or sys.argv[idx + 1] not in VIDEO_PROBE_MODES:
+            print(f"Error: --video-probe requires one of: {', '.join(VIDEO_PROBE_MODES)}", file=sys.stderr)
+            sys.exit(1)
+        VIDEO_PROBE_MODE = sys.argv[idx + 1]
+        del sys.argv[idx:idx + 2]
+    if '--video-timeout' in sys.argv:
+        idx = sys.argv.index('--video-timeout')
+        if idx + 1 >= len(sys.argv) or not sys.argv[idx + 1].isdigit():
+            print("Error: --video-timeout requires a number of seconds (0 = no limit)", file=sys.stderr)
+            sys.exit(1)
+        VIDEO_TIMEOUT = int(sys.argv[idx + 1]) or None
+        del sys.argv[idx:idx + 2]
+    else:
+        VIDEO_TIMEOUT = default_video_timeout(VIDEO_PROBE_MODE)
+    if len(sys.argv) < 2:
+        print("Error: no file to analyse", file=sys.stderr)
+        sys.exit(1)
+
+    if sys.argv[1] == "--batch":
+        args = sys.argv[2:]
+        jobs = os.cpu_count() or 1
+        if "--jobs" in args:
+            idx = args.index("--jobs")
+            if idx + 1 >= len(args) or not args[idx + 1].isdigit():
+                print("Error: --jobs requires a number of worker processes", file=sys.stderr)
+                sys.exit(1)
+            jobs = max(1, int(args[idx + 1]))
+            del args[idx:idx + 2]
+        if not args:
+            print("Error: --batch requires a directory, a file list or - for stdin", file=sys.stderr)
+            sys.exit(1)
+        ffprobe_path = args[1] if len(args) > 1 and os.path.exists(args[1]) else default_ffprobe_path()
+        sys.exit(run_batch(args[0], ffprobe_path, jobs))
+
+    file_path = sys.argv[1]
     
     # Check if an alternative ffprobe path is provided and valid; otherwise, use the default
     if len(sys.argv) > 2 and os.path.exists(sys.argv[2]):
         ffprobe_path = sys.argv[2]
     else:
-        ffprobe_path = default_ffprobe_path
+        ffprobe_path = default_ffprobe_path()
     
-    video_corruption_check = "NA"
-    if file_extension.lower() in ['.mp4', '.m4v']:
+    if get_file_extension(file_path).lower() in ['.mp4', '.m4v']:
         # Set up logging only if an MP4 file is found
         log_file_path = 'log_VIDEO_ANALYSIS.log'
 
         logging.basicConfig(filename=log_file_path, level=logging.INFO, format='%(message)s')
 
-        video_corruption_check = analyze_video(file_path, ffprobe_path)
-        
-    if any(check == -1 for check in [file_size, missing_bytes]) or any(check == "ERROR" for check in [sdata_version, sha1]):
+    row, lines = cached_analyze_file(file_path, ffprobe_path)
+    for line in lines:
+        log_and_print(line)
+    if row is None:
         sys.exit(1)
 
-    print(f"{file_extension}\t{file_size}\t{sdata_version}\t{sha1}\t{missing_bytes}\t{image_corruption_check}\t{video_corruption_check}")
\ No newline at end of file
+    print(row)
@@ -0,0 +1,22 @@
+import hashlib
+import os
+
+FINGERPRINT_BLOCK = 64 * 1024
+
+def partial_fingerprint(path, block_size=FINGERPRINT_BLOCK):
+    # BLAKE2b of the file size and three blocks taken from the head, the middle and the
+    # tail. Files that fit in those three blocks are hashed whole. Different fingerprints
+    # mean different files; equal ones still need a full hash to be sure. None if unreadable.
+    try:
+        with open(str(path), 'rb', buffering=0) as f:
+            size = os.fstat(f.fileno()).st_size
+            digest = hashlib.blake2b(size.to_bytes(8, 'little'), digest_size=16)
+            if size <= 3 * block_size:
+                digest.update(f.read())
+            else:
+                for offset in (0, (size - block_size) // 2, size - block_size):
+                    f.seek(offset)
+                    digest.update(f.read(block_size))
+            return digest.hexdigest()
+    except OSError:
+        return None
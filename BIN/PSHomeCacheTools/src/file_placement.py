@@ -0,0 +1,100 @@
+import errno
+import hashlib
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LINK_MODES = ("copy", "hardlink", "reflink", "auto")
+COPY_CHUNK = 1024 * 1024
+
+# _IOW(0x94, 9, int) from linux/fs.h, supported by btrfs, xfs and other CoW filesystems
+FICLONE = 0x40049409
+
+# Errors meaning "this filesystem/OS can't do that", as opposed to a real I/O failure
+UNSUPPORTED_ERRNOS = {
+    errno.EXDEV, errno.EPERM, errno.EINVAL, errno.ENOSYS, errno.ENOTTY,
+    errno.EOPNOTSUPP, errno.EACCES, getattr(errno, "ENOTSUP", errno.EOPNOTSUPP),
+}
+
+def _replace_via_temp(dst, make):
+    # link()/FICLONE won't overwrite, so build the new file next to dst and swap it in
+    tmp = f"{dst}.placing"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    try:
+        make(tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        raise
+
+def hardlink_file(src, dst):
+    _replace_via_temp(dst, lambda tmp: os.link(src, tmp))
+
+def reflink_file(src, dst):
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflink is not supported on this platform", str(dst))
+
+    def clone(tmp):
+        with open(src, 'rb') as fsrc, open(tmp, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        shutil.copystat(src, tmp)
+
+    _replace_via_temp(dst, clone)
+
+def range_copy_file(src, dst):
+    # In-kernel copy; the filesystem may turn this into a server-side copy or a clone.
+    # Some filesystems report end of file early (procfs-like or network mounts), so a
+    # short copy counts as unsupported and "auto" falls back to the hashing copy
+    if not hasattr(os, "copy_file_range"):
+        raise OSError(errno.ENOSYS, "copy_file_range is not available", str(dst))
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        expected = os.fstat(fsrc.fileno()).st_size
+        remaining = expected
+        while remaining > 0:
+            copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), min(remaining, 1 << 30))
+            if copied == 0:
+                raise OSError(errno.EOPNOTSUPP, f"copy_file_range stopped after {expected - remaining} of {expected} bytes", str(dst))
+            remaining -= copied
+    shutil.copystat(src, dst)
+
+def copy_and_hash(src, dst, chunk_size=COPY_CHUNK):
+    # One read of src feeds both the destination and the SHA1 of the bytes written, so the
+    # copy can be checked against an earlier hash without reading dst back
+    sha1 = hashlib.sha1()
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        while n := fsrc.readinto(buf):
+            sha1.update(view[:n])
+            fdst.write(view[:n])
+    shutil.copystat(src, dst)
+    return sha1.hexdigest().upper()
+
+def place_file(src, dst, mode="copy"):
+    # Puts src at dst and returns (mode actually used, SHA1 of the written data or None).
+    # "copy" streams through user space and hashes on the way, "hardlink" and "reflink"
+    # fail loudly when the filesystem can't do them, "auto" tries reflink, then
+    # copy_file_range, then the hashing copy, so it never shares data blocks that could
+    # change under the archive. Kernel-side modes return no SHA1, their data is src's.
+    src, dst = str(src), str(dst)
+    if mode == "hardlink":
+        hardlink_file(src, dst)
+        return "hardlink", None
+    if mode == "reflink":
+        reflink_file(src, dst)
+        return "reflink", None
+    if mode == "auto":
+        for name, method in (("reflink", reflink_file), ("copy_file_range", range_copy_file)):
+            try:
+                method(src, dst)
+                return name, None
+            except OSError as e:
+                if e.errno not in UNSUPPORTED_ERRNOS:
+                    raise
+    return "copy", copy_and_hash(src, dst)
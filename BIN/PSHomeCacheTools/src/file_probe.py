@@ -0,0 +1,91 @@
+import hashlib
+import os
+
+HEAD_SIZE = 8192
+HASH_CHUNK = 1024 * 1024
+SDATA_TRAILER_SIZE = 16
+
+SDATA_SIGNATURES = {
+    b"SDATA 4.0.0.W\x00\x00\x00": "4.0",
+    b"SDATA 2.4.0.W\x00\x00\x00": "2.4",
+    b"SDATA 2.2.0.W\x00\x00\x00": "2.2",
+    b"SDATA 3.3.0.W\x00\x00\x00": "3.3",
+}
+
+# Markers that make an extensionless file starting with '<' an XML file
+XML_SNIFF_MARKERS = ('<xml', '<?xml', '<rss', '<profile')
+SNIFF_CHARS = 2048
+
+class FileProbe:
+    # Everything cheap about one file from a single open and fstat: size, the first
+    # head_size bytes, the 16-byte SDATA trailer and, when sha1 is asked for, the SHA1 of
+    # the whole file streamed in the same pass. error holds the OSError that cut the probe
+    # short; size is then -1 if even fstat failed, and sha1 is "ERROR".
+
+    def __init__(self, path, sha1=True, head_size=HEAD_SIZE):
+        self.path = str(path)
+        self.size = -1
+        self.head = b""
+        self.tail = b""
+        self.sha1 = None
+        self.error = None
+        try:
+            with open(self.path, 'rb', buffering=0) as f:
+                self.size = os.fstat(f.fileno()).st_size
+                if sha1:
+                    self._stream(f, head_size)
+                else:
+                    self.head = f.read(head_size) if head_size else b""
+                    if self.size >= SDATA_TRAILER_SIZE:
+                        f.seek(-SDATA_TRAILER_SIZE, os.SEEK_END)
+                        self.tail = f.read(SDATA_TRAILER_SIZE)
+        except OSError as e:
+            self.error = e
+            if sha1:
+                self.sha1 = "ERROR"
+            if self.size == -1:
+                # A file that can be listed but not opened still has a size
+                try:
+                    self.size = os.stat(self.path).st_size
+                except OSError:
+                    pass
+
+    def _stream(self, f, head_size):
+        sha1 = hashlib.sha1()
+        buf = bytearray(HASH_CHUNK)
+        view = memoryview(buf)
+        head = bytearray()
+        tail = b""
+        while n := f.readinto(buf):
+            sha1.update(view[:n])
+            if len(head) < head_size:
+                head += view[:min(n, head_size - len(head))]
+            tail = (tail + bytes(view[max(0, n - SDATA_TRAILER_SIZE):n]))[-SDATA_TRAILER_SIZE:]
+        self.head = bytes(head)
+        self.tail = tail
+        self.sha1 = sha1.hexdigest().upper()
+
+    def sdata_version(self):
+        # "4.0", "3.3", ... from the trailer, "0" when there is none, "ERROR" if unreadable
+        if self.size < SDATA_TRAILER_SIZE:
+            return "0"
+        if self.error is not None or len(self.tail) != SDATA_TRAILER_SIZE:
+            return "ERROR"
+        return SDATA_SIGNATURES.get(self.tail, "0")
+
+    def missing_bytes(self):
+        # Bytes short of the 16-byte block size of encrypted cache files, -1 if unknown
+        if self.size < 0:
+            return -1
+        return (16 - self.size % 16) % 16
+
+    def sniff_type(self):
+        # "json" or "xml" for extensionless files whose first characters look like one,
+        # read the way a text-mode open would see them
+        text = self.head.decode('utf-8', errors='ignore')
+        text = text.replace('\r\n', '\n').replace('\r', '\n')[:SNIFF_CHARS].strip()
+        if text.startswith('{') or text.startswith('['):
+            return "json"
+        if text.startswith('<') and any(marker in text.lower() for marker in XML_SNIFF_MARKERS):
+            return "xml"
+        return None
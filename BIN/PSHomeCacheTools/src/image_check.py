@@ -0,0 +1,314 @@
+import io
+import os
+import struct
+import zlib
+
+from PIL import Image, UnidentifiedImageError
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+JPEG_SOI = b'\xff\xd8'
+
+# Bit depths allowed for each PNG colour type
+PNG_BIT_DEPTHS = {0: (1, 2, 4, 8, 16), 2: (8, 16), 3: (1, 2, 4, 8), 4: (8, 16), 6: (8, 16)}
+
+# Huffman-coded baseline, extended and progressive frames; anything rarer is left to Pillow
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2}
+# DDS: "DDS " magic, 124-byte DDS_HEADER, then a 20-byte DDS_HEADER_DXT10 for FourCC "DX10"
+DDS_MAGIC = b'DDS '
+DDS_HEADER_SIZE = 4 + 124
+DDS_DX10_HEADER_SIZE = DDS_HEADER_SIZE + 20
+DDSD_MIPMAPCOUNT = 0x20000
+DDSD_DEPTH = 0x800000
+DDPF_FOURCC = 0x4
+DDPF_UNCOMPRESSED = 0x2 | 0x20 | 0x40 | 0x200 | 0x20000
+DDSCAPS2_CUBEMAP = 0x200
+DDSCAPS2_CUBEMAP_FACES = (0x400, 0x800, 0x1000, 0x2000, 0x4000, 0x8000)
+DDSCAPS2_VOLUME = 0x200000
+DDS_RESOURCE_MISC_TEXTURECUBE = 0x4
+DDS_DIMENSION_TEXTURE3D = 4
+
+# Bytes per 4x4 block of the block-compressed formats
+DDS_FOURCC_BLOCK_BYTES = {
+    b'DXT1': 8, b'DXT2': 16, b'DXT3': 16, b'DXT4': 16, b'DXT5': 16,
+    b'ATI1': 8, b'BC4U': 8, b'BC4S': 8, b'ATI2': 16, b'BC5U': 16, b'BC5S': 16,
+}
+# D3DFMT codes stored in the FourCC field for float/16-bit formats, in bits per pixel
+DDS_FOURCC_BITS = {36: 64, 110: 64, 111: 16, 112: 32, 113: 64, 114: 32, 115: 64, 116: 128}
+DXGI_BLOCK_BYTES = {
+    **dict.fromkeys(range(70, 73), 8), **dict.fromkeys(range(73, 79), 16),
+    **dict.fromkeys(range(79, 82), 8), **dict.fromkeys(range(82, 85), 16),
+    **dict.fromkeys(range(94, 100), 16),
+}
+DXGI_BITS = {
+    **dict.fromkeys(range(1, 5), 128), **dict.fromkeys(range(5, 9), 96),
+    **dict.fromkeys(range(9, 23), 64), **dict.fromkeys(range(23, 48), 32),
+    **dict.fromkeys(range(48, 60), 16), **dict.fromkeys(range(60, 66), 8),
+    67: 32, 85: 16, 86: 16, **dict.fromkeys(range(87, 94), 32), 115: 16,
+}
+
+# Markers without a length field: TEM and RST0-7
+JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD8)}
+# Segments the walker steps over: APP0-15, COM and DRI; other markers end the fast check
+JPEG_SKIPPED_MARKERS = {*range(0xE0, 0xF0), 0xFE, 0xDD}
+
+def check_png(data):
+    # Walks the chunks up to IEND checking every CRC, without inflating IDAT.
+    # 1 = corrupt, 0 = sound, None = can't tell without decoding.
+    if not data.startswith(PNG_SIGNATURE):
+        return None
+    pos = len(PNG_SIGNATURE)
+    end = len(data)
+    seen_idat = False
+    while True:
+        if end - pos < 8:
+            # A partial chunk header is corrupt; a file cut exactly between chunks goes to Pillow
+            return 1 if pos < end else None
+        length, cid = struct.unpack_from(">I4s", data, pos)
+        if not cid.isalpha():
+            return 1
+        if cid == b'IEND':
+            # Pillow stops at the IEND header and never reads its CRC
+            return 0 if seen_idat else None
+        chunk_end = pos + 12 + length
+        if chunk_end > end:
+            return 1
+        crc = struct.unpack_from(">I", data, chunk_end - 4)[0]
+        if zlib.crc32(data[pos + 4:chunk_end - 4]) != crc:
+            return 1
+        if pos == len(PNG_SIGNATURE):
+            if cid != b'IHDR' or length != 13:
+                return None
+            width, height, depth, color, compression, filtering, interlace = struct.unpack_from(">IIBBBBB", data, pos + 8)
+            if not width or not height or depth not in PNG_BIT_DEPTHS.get(color, ()) or compression or filtering or interlace > 1:
+                return None
+        elif cid == b'IDAT':
+            seen_idat = True
+        pos = chunk_end
+
+def huffman_table_ok(counts, symbols, dc):
+    # libjpeg rejects tables whose canonical codes overflow their length or that
+    # hand out the all-ones code, and DC tables with symbols above 15
+    if dc and any(symbol > 15 for symbol in symbols):
+        return False
+    last = max((length for length, count in enumerate(counts, 1) if count), default=0)
+    code = 0
+    for length in range(1, last + 1):
+        code += counts[length - 1]
+        if code >= 1 << length:
+            return False
+        code <<= 1
+    return True
+
+def scan_header_ok(seg, tables):
+    sof, components = tables['frame']
+    count = seg[0]
+    if not 1 <= count <= 4 or len(seg) != 4 + 2 * count:
+        return False
+    selectors = seg[1:1 + 2 * count:2]
+    if len(set(selectors)) != count or any(c not in components for c in selectors):
+        return False
+    if any(components[c][1] not in tables['quant'] for c in selectors):
+        return False
+    if count > 1 and sum(components[c][0] for c in selectors) > 10:
+        return False
+    start, stop, approx = seg[-3], seg[-2], seg[-1]
+    needed = ('dc', 'ac')
+    if sof == 0xC2:
+        high, low = approx >> 4, approx & 0x0F
+        if (start == 0 and stop != 0) or (start and (stop < start or stop > 63 or count != 1)):
+            return False
+        if (high and low != high - 1) or low > 13:
+            return False
+        needed = ('ac',) if start else ('dc',) if not high else ()
+    # libjpeg falls back to the standard tables for slots 0 and 1 only
+    for i in range(count):
+        selected = {'dc': seg[2 + 2 * i] >> 4, 'ac': seg[2 + 2 * i] & 0x0F}
+        for table_class in needed:
+            index = selected[table_class]
+            if index > 1 and (table_class, index) not in tables['huffman']:
+                return False
+    return True
+
+def jpeg_segment_ok(marker, seg, tables):
+    # Checks one marker segment (payload after the length field) for the errors libjpeg
+    # stops on before decoding; tables collects what later segments depend on.
+    if marker == 0xDB:
+        pos = 0
+        while pos < len(seg):
+            precision, index = seg[pos] >> 4, seg[pos] & 0x0F
+            if precision > 1 or index > 3:
+                return False
+            pos += 1 + 64 * (precision + 1)
+            tables['quant'].add(index)
+        return pos == len(seg)
+    if marker == 0xC4:
+        pos = 0
+        while pos < len(seg):
+            if len(seg) - pos < 17:
+                return False
+            table_class, index = seg[pos] >> 4, seg[pos] & 0x0F
+            counts = seg[pos + 1:pos + 17]
+            total = sum(counts)
+            if table_class > 1 or index > 3 or pos + 17 + total > len(seg):
+                return False
+            if not huffman_table_ok(counts, seg[pos + 17:pos + 17 + total], table_class == 0):
+                return False
+            tables['huffman'].add(('ac' if table_class else 'dc', index))
+            pos += 17 + total
+        return True
+    if marker in JPEG_SOF_MARKERS:
+        if tables['frame'] is not None or len(seg) < 6:
+            return False
+        precision, height, width, count = struct.unpack_from(">BHHB", seg)
+        if precision != 8 or count not in (1, 3, 4) or not height or not width or len(seg) != 6 + 3 * count:
+            return False
+        components = {}
+        for pos in range(6, len(seg), 3):
+            sampling, quant = seg[pos + 1], seg[pos + 2]
+            if not 1 <= sampling >> 4 <= 4 or not 1 <= sampling & 0x0F <= 4 or quant > 3:
+                return False
+            components[seg[pos]] = ((sampling >> 4) * (sampling & 0x0F), quant)
+        tables['frame'] = (marker, components)
+        return True
+    if marker == 0xDA:
+        return tables['frame'] is not None and bool(seg) and scan_header_ok(seg, tables)
+    return marker in JPEG_SKIPPED_MARKERS
+
+def check_jpeg(data):
+    # Walks the markers up to EOI, checking the table, frame and scan headers and stepping
+    # over entropy-coded scan data, which libjpeg only warns about. A clean SOI..EOI
+    # stream is 0; anything truncated, damaged or unusual is None and goes to Pillow.
+    if not data.startswith(JPEG_SOI):
+        return None
+    pos = len(JPEG_SOI)
+    end = len(data)
+    tables = {'quant': set(), 'huffman': set(), 'frame': None}
+    scanned = False
+    while pos + 1 < end:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker == 0xD9:
+            return 0 if scanned else None
+        if marker in JPEG_STANDALONE_MARKERS:
+            pos += 2
+            continue
+        if end - pos < 4:
+            return None
+        length = struct.unpack_from(">H", data, pos + 2)[0]
+        if length < 2 or pos + 2 + length > end:
+            return None
+        if not jpeg_segment_ok(marker, data[pos + 4:pos + 2 + length], tables):
+            return None
+        pos += 2 + length
+        if marker == 0xDA:
+            scanned = True
+            # Scan data runs to the first 0xFF that isn't stuffing (FF00) or a restart marker
+            while True:
+                pos = data.find(b'\xff', pos)
+                if pos < 0 or pos + 1 >= end:
+                    return None
+                following = data[pos + 1]
+                if following == 0x00 or 0xD0 <= following <= 0xD7:
+                    pos += 2
+                    continue
+                break
+    return None
+
+def dds_layout(head):
+    # (block width, bytes per block or pixel, data offset) for the DDS format, or None
+    # for formats whose size this table doesn't know
+    pf_flags, fourcc, bit_count = struct.unpack_from("<I4sI", head, 80)
+    if pf_flags & DDPF_FOURCC:
+        if fourcc == b'DX10':
+            if len(head) < DDS_DX10_HEADER_SIZE:
+                return None
+            dxgi_format = struct.unpack_from("<I", head, DDS_HEADER_SIZE)[0]
+            if dxgi_format in DXGI_BLOCK_BYTES:
+                return 4, DXGI_BLOCK_BYTES[dxgi_format], DDS_DX10_HEADER_SIZE
+            if dxgi_format in DXGI_BITS:
+                return 1, DXGI_BITS[dxgi_format] // 8, DDS_DX10_HEADER_SIZE
+            return None
+        if fourcc in DDS_FOURCC_BLOCK_BYTES:
+            return 4, DDS_FOURCC_BLOCK_BYTES[fourcc], DDS_HEADER_SIZE
+        code = struct.unpack("<I", fourcc)[0]
+        if code in DDS_FOURCC_BITS:
+            return 1, DDS_FOURCC_BITS[code] // 8, DDS_HEADER_SIZE
+        return None
+    if pf_flags & DDPF_UNCOMPRESSED and bit_count in (8, 16, 24, 32, 64, 128):
+        return 1, bit_count // 8, DDS_HEADER_SIZE
+    return None
+
+def check_dds(head, file_size):
+    # Works out the size of every surface (array slices or cube faces, each with its mip
+    # chain and volume slices) from the header alone and compares it with the file size.
+    # 1 = header broken or data cut short, 0 = all surfaces present, None = can't tell.
+    if len(head) < DDS_HEADER_SIZE or struct.unpack_from("<I", head, 4)[0] != 124:
+        return 1
+    flags, height, width, _, depth, mip_count = struct.unpack_from("<6I", head, 8)
+    caps2 = struct.unpack_from("<I", head, 112)[0]
+    layout = dds_layout(head)
+    if layout is None or not width or not height:
+        return None
+    block, unit, offset = layout
+
+    mip_count = mip_count if flags & DDSD_MIPMAPCOUNT and mip_count else 1
+    if mip_count > 32:
+        return 1
+    surfaces = 1
+    if offset == DDS_DX10_HEADER_SIZE:
+        dimension, misc_flags, array_size = struct.unpack_from("<3I", head, DDS_HEADER_SIZE + 4)
+        surfaces = max(array_size, 1) * (6 if misc_flags & DDS_RESOURCE_MISC_TEXTURECUBE else 1)
+        volume = dimension == DDS_DIMENSION_TEXTURE3D
+    else:
+        if caps2 & DDSCAPS2_CUBEMAP:
+            surfaces = sum(1 for face in DDSCAPS2_CUBEMAP_FACES if caps2 & face)
+        volume = bool(caps2 & DDSCAPS2_VOLUME and flags & DDSD_DEPTH)
+    depth = max(depth, 1) if volume else 1
+
+    chain = 0
+    for level in range(mip_count):
+        w, h, d = max(width >> level, 1), max(height >> level, 1), max(depth >> level, 1)
+        chain += -(-w // block) * -(-h // block) * d * unit
+    return 1 if file_size < offset + chain * surfaces else 0
+
+def check_structure(data):
+    if data.startswith(PNG_SIGNATURE):
+        return check_png(data)
+    if data.startswith(JPEG_SOI):
+        return check_jpeg(data)
+    return None
+
+def decode_check(data):
+    # verify() leaves the image unusable, so the full decode re-opens it from the same bytes
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.verify()
+        with Image.open(io.BytesIO(data)) as img:
+            img.load()
+    except (IOError, SyntaxError, UnidentifiedImageError, ValueError, AttributeError):
+        return 1
+    return 0
+
+def is_image_corrupt(filepath, mode="fast"):
+    # Opens the file once. "fast" settles PNG and JPEG from their structure and DDS from
+    # its header and the file size, and only decodes the pixels when that is inconclusive;
+    # "strict" always decodes with Pillow.
+    try:
+        with open(filepath, 'rb') as f:
+            head = f.read(DDS_DX10_HEADER_SIZE)
+            if mode == "fast" and head.startswith(DDS_MAGIC):
+                verdict = check_dds(head, os.fstat(f.fileno()).st_size)
+                if verdict is not None:
+                    return verdict
+            data = head + f.read()
+    except OSError:
+        return 1
+    if mode == "fast":
+        verdict = check_structure(data)
+        if verdict is not None:
+            return verdict
+    return decode_check(data)
@@ -2,39 +2,25 @@ import sys
 import os
 from pathlib import Path
 import time
+import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from file_probe import FileProbe
+from sdat_index import SIDECAR_NAME, SdatIndexSidecar, build_sdat_index
 
 def dbg(msg, *args):
     print("[DEBUG]", msg % args if args else msg)
 
-def get_file_size(file_path):
-    try:
-        return os.path.getsize(file_path)
-    except Exception as e:
-        dbg("Error getting file size: %s", e)
-        return -1
-
-def get_sdata_version(file_path, file_size):
+def get_sdata_version(file_path):
     if not file_path.lower().endswith('.sdat'):
         return "NA"
-    if file_size < 16:
-        return "0"
-    version_signatures = {
-        b"SDATA 4.0.0.W\x00\x00\x00": "4.0",
-        b"SDATA 2.4.0.W\x00\x00\x00": "2.4",
-        b"SDATA 2.2.0.W\x00\x00\x00": "2.2",
-        b"SDATA 3.3.0.W\x00\x00\x00": "3.3",
-    }
-    try:
-        with open(file_path, 'rb') as file:
-            file.seek(-16, 2)
-            end_bytes = file.read(16)
-            for signature, version in version_signatures.items():
-                if end_bytes == signature:
-                    return version
-            return "0"
-    except Exception as e:
-        dbg("Error checking SDATA version: %s", e)
-        return "ERROR"
+    probe = FileProbe(file_path, sha1=False, head_size=0)
+    if probe.error is not None:
+        if probe.size == -1:
+            dbg("Error getting file size: %s", probe.error)
+        else:
+            dbg("Error checking SDATA version: %s", probe.error)
+    return probe.sdata_version()
 
 def split_inf_path(path):
     parts = path.strip('/').split('/')
@@ -62,18 +48,6 @@ def get_ext(filename):
 def get_fname_without_ext(filename):
     return filename.rsplit('.', 1)[0] if '.' in filename else filename
 
-def build_sdat_index(search_root):
-    index = {}
-    for f in Path(search_root).rglob("*.sdat"):
-        if f.is_file():
-            name = f.name.lower()
-            if name.endswith(".sdat") and "_dat" in name:
-                hashval = name.split('_')[0]
-                if hashval not in index:
-                    index[hashval] = []
-                index[hashval].append(str(f))
-    return index
-
 def find_sdat_file_from_index(sdat_index, hashval, _call_counter=[0]):
     _call_counter[0] += 1
     hashval = str(hashval).lower()
@@ -82,398 +56,399 @@ def find_sdat_file_from_index(sdat_index, hashval, _call_counter=[0]):
         return matches[0]
     return None
 
-_sdat_dir_cache = {}
-_sdat_hash_index = {}
+FIXED_FOLDERS = {"NPIA00005", "NPIA00010", "NPEA00013"}
+FIXED_FOLDERS_LC = {f.lower() for f in FIXED_FOLDERS}
+# INF lines of one cache handed to a --jobs worker at a time
+STRETCH_CHUNK = 4096
 
-def find_sdat_file_unlimited(path_combo, inf_cachename, INF_hash, debug):
-    FIXED_FOLDERS = {"NPIA00005", "NPIA00010", "NPEA00013"}
-    FIXED_FOLDERS_LC = {f.lower() for f in FIXED_FOLDERS}
-
-    if "|" not in path_combo:
-        if debug:
-            dbg("No '|' found in cache_folder_path: %r", path_combo)
-        return None
+_sdat_dir_index = {}
+_sdat_hash_index = {}
 
+def split_cache_folder(path_combo):
     root, sub = path_combo.split("|", 1)
     root = root.strip().replace("/", "\\")
     sub = sub.strip().replace("/", "\\").lstrip("\\")
-    search_root = Path(root)
-
-    if not search_root.is_dir():
-        if debug:
-            dbg("Root search directory does not exist: %r", search_root)
-        return None
+    return Path(root), sub
 
-    inf_cachename_lc = inf_cachename.lower()
-    sub_lc_parts = [s.lower() for s in Path(sub).parts]
-    cache_key = (str(search_root).lower(), inf_cachename_lc, str(sub).lower())
-
-    if cache_key not in _sdat_dir_cache:
-        matched_dirs = []
-        for dirpath, dirnames, filenames in os.walk(search_root):
-            dirpath_parts = Path(dirpath).parts
-            dirpath_parts_lc = [p.lower() for p in dirpath_parts]
+def find_subpath(parts, sub_parts):
+    for i in range(len(parts) - len(sub_parts) + 1):
+        if parts[i:i + len(sub_parts)] == sub_parts:
+            return i
+    return None
 
-            try:
-                idx_inf = dirpath_parts_lc.index(inf_cachename_lc)
-            except ValueError:
+def build_unlimited_sdat_index(search_root, subs, debug=False):
+    # One os.walk of search_root for every sub at once. A directory belongs to a cache when
+    # its path runs <cache>/.../<fixed folder>/.../<sub>, which also takes in everything below
+    # <sub>. Returns {sub: {cache: [{hash: sdat path} per directory, in walk order]}}.
+    sub_parts = {sub.lower(): [s.lower() for s in Path(sub).parts] for sub in subs}
+    index = {sub_lc: {} for sub_lc in sub_parts}
+    dir_count = 0
+    for dirpath, dirnames, filenames in os.walk(search_root):
+        dirpath_parts_lc = [p.lower() for p in Path(dirpath).parts]
+        sdat_map = None
+        for sub_lc, parts in sub_parts.items():
+            idx_sub = find_subpath(dirpath_parts_lc, parts)
+            if idx_sub is None:
                 continue
-
-            for i in range(len(dirpath_parts_lc) - len(sub_lc_parts) + 1):
-                if dirpath_parts_lc[i:i + len(sub_lc_parts)] == sub_lc_parts:
-                    idx_sub = i
-                    break
-            else:
+            fixed = [i for i in range(idx_sub) if dirpath_parts_lc[i] in FIXED_FOLDERS_LC]
+            if not fixed:
                 continue
-
-            between = dirpath_parts_lc[idx_inf + 1:idx_sub]
-            if not FIXED_FOLDERS_LC.intersection(between):
-                continue
-
-            matched_dirs.append(Path(dirpath))
-
-            hash_key = (inf_cachename_lc, dirpath.lower())
-            if hash_key not in _sdat_hash_index:
-                _sdat_hash_index[hash_key] = {}
+            if sdat_map is None:
+                sdat_map = {}
                 for file in filenames:
                     if file.lower().endswith(".sdat") and "_dat" in file.lower():
                         hashval = file.lower().split("_")[0]
-                        _sdat_hash_index[hash_key][hashval] = os.path.join(dirpath, file)
-
-        _sdat_dir_cache[cache_key] = matched_dirs
-        if debug:
-            dbg("Cached %d dirs for key: %r", len(matched_dirs), cache_key)
-
-    for candidate in _sdat_dir_cache[cache_key]:
-        hash_key = (inf_cachename_lc, str(candidate).lower())
-        sdat_map = _sdat_hash_index.get(hash_key, {})
-        sdat_file = sdat_map.get(INF_hash.lower())
-        if sdat_file:
-            if debug:
-                dbg("Found SDAT (unlimited_all): %s (hash match: %s)", sdat_file, INF_hash)
-            return sdat_file
-
+                        sdat_map[hashval] = os.path.join(dirpath, file)
+                dir_count += 1
+            # Any folder name before the last fixed folder can be the cache name
+            for cache_lc in set(dirpath_parts_lc[:fixed[-1]]):
+                index[sub_lc].setdefault(cache_lc, []).append(sdat_map)
     if debug:
-        dbg("No SDAT found for unlimited_all: %s\\%s\\**\\%s [hash=%s]", root, inf_cachename, sub, INF_hash)
-    return None
-
-
+        dbg("Indexed %d dirs under %r for %r", dir_count, str(search_root), list(sub_parts))
+    return index
 
-def process_objects(
-    lines, log_func, cachename=None, debug=False, object_cache_folder=None, sdat_index=None,
-    unlimited_all=False, start_time=None
-):
-    import time
-    found = False
-    printed_cachenames = set()
-    infcachename_counter = 1
+def index_unlimited_folders(path_combos, debug=False):
+    # Walks each distinct root of the --objects/--scenes "root|sub" folders once
+    subs_by_root = {}
+    for path_combo in path_combos:
+        if path_combo and "|" in path_combo:
+            search_root, sub = split_cache_folder(path_combo)
+            subs_by_root.setdefault(str(search_root).lower(), (search_root, set()))[1].add(sub)
+    for root_lc, (search_root, subs) in subs_by_root.items():
+        if not search_root.is_dir():
+            continue
+        for sub_lc, caches in build_unlimited_sdat_index(search_root, subs, debug).items():
+            _sdat_dir_index[(root_lc, sub_lc)] = caches
 
-    def format_delta(seconds):
-        seconds = int(seconds)
-        if seconds < 60:
-            return f"{seconds}s"
-        elif seconds < 3600:
-            return f"{seconds // 60}m{seconds % 60:02d}s"
-        else:
-            return f"{seconds // 3600}h{(seconds % 3600)//60:02d}m{seconds % 60:02d}s"
+def find_sdat_file_unlimited(path_combo, inf_cachename, INF_hash, debug):
+    if "|" not in path_combo:
+        if debug:
+            dbg("No '|' found in cache_folder_path: %r", path_combo)
+        return None
 
-    sdat_count_by_cache = {}
-    for line in lines:
-        parts = line.rstrip('\n').split('|')
-        if len(parts) < 4:
-            continue
-        _, INF_path, _, INF_cachename = parts[:4]
-        if INF_path.lower().endswith('.sdat'):
-            key = INF_cachename.lower()
-            sdat_count_by_cache[key] = sdat_count_by_cache.get(key, 0) + 1
+    search_root, sub = split_cache_folder(path_combo)
+    root_key = (str(search_root).lower(), sub.lower())
 
-    object_cache_missing = object_cache_folder is not None and not os.path.isdir(
-        object_cache_folder.split("|")[0] if unlimited_all and "|" in object_cache_folder else object_cache_folder
-    )
+    if root_key not in _sdat_dir_index:
+        if not search_root.is_dir():
+            if debug:
+                dbg("Root search directory does not exist: %r", search_root)
+            return None
+        _sdat_dir_index[root_key] = build_unlimited_sdat_index(search_root, [sub], debug)[sub.lower()]
 
-    curr_cache = None
-    curr_cache_start = None
+    inf_cachename_lc = inf_cachename.lower()
+    cache_key = root_key + (inf_cachename_lc,)
+    sdat_map = _sdat_hash_index.get(cache_key)
+    if sdat_map is None:
+        # The first directory walked wins when several hold the same hash
+        sdat_map = {}
+        for dir_map in _sdat_dir_index[root_key].get(inf_cachename_lc, ()):
+            for hashval, sdat_file in dir_map.items():
+                sdat_map.setdefault(hashval, sdat_file)
+        _sdat_hash_index[cache_key] = sdat_map
+
+    sdat_file = sdat_map.get(INF_hash.lower())
+    if sdat_file:
+        if debug:
+            dbg("Found SDAT (unlimited_all): %s (hash match: %s)", sdat_file, INF_hash)
+        return sdat_file
 
-    printed_stats_for_current = False
+    if debug:
+        dbg("No SDAT found for unlimited_all: %s\\%s\\**\\%s [hash=%s]", search_root, inf_cachename, sub, INF_hash)
+    return None
 
-    cache_lines = []
-    for line in lines:
-        parts = line.rstrip('\n').split('|')
-        cache_lines.append(parts[3].lower() if len(parts) >= 4 else None)
 
-    for idx, (line_num, line) in enumerate(zip(range(1, len(lines)+1), lines)):
+def format_delta(seconds):
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    elif seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    else:
+        return f"{seconds // 3600}h{(seconds % 3600)//60:02d}m{seconds % 60:02d}s"
+
+
+class RowEmitter:
+    # Turns the INF lines of one kind (objects or scenes) into log rows as they stream past
+    # and writes them straight to out. With unlimited_all each stretch of one cache's lines
+    # gets a logging line and a stats line, with SDATs counted as the lines go by and the
+    # time spent on that stretch. With jobs > 1 stretches are cut into chunks of at most
+    # STRETCH_CHUNK lines, turned into rows on a thread pool and written back in input
+    # order, at most jobs + 1 chunks held at a time however long one cache's stretch is.
+
+    def __init__(self, row_func, out, unlimited_all=False, start_time=None, jobs=1, console=print, debug=False):
+        self.row_func = row_func
+        self.out = out
+        self.unlimited_all = unlimited_all
+        self.start_time = start_time
+        self.jobs = jobs
+        self.console = console
+        self.debug = debug
+        self.found = False
+        self.line_num = 0
+        self.counter = 0
+        self.sdat_counts = {}
+        self.curr_cache = None
+        self.curr_name = None
+        self.curr_time = 0.0
+        self.stretch = []
+        self.stretch_first = True
+        self.written_time = 0.0
+        self.pending = deque()
+        self.pool = ThreadPoolExecutor(max_workers=jobs) if unlimited_all and jobs > 1 else None
+
+    def feed(self, line):
+        self.line_num += 1
         parts = line.rstrip('\n').split('|')
         if len(parts) < 4:
-            if debug:
-                dbg("Skipping line %d (too few fields): %r", line_num, line)
-            continue
-        INF_hash, INF_path, INF_date, INF_cachename = parts[:4]
-        inf_cachename_lc = INF_cachename.lower()
-
-        if unlimited_all and inf_cachename_lc != curr_cache:
-            if curr_cache is not None and curr_cache_start is not None:
-                now = time.time()
-                delta = now - curr_cache_start
-                print(f"({infcachename_counter-1}) {curr_cache_name} ~ stats : sdats = {sdat_count_by_cache.get(curr_cache, 0)} / time taken = {format_delta(delta)}")
-                printed_stats_for_current = True
-            elapsed = time.time() - start_time if start_time is not None else 0
-            elapsed_str = time.strftime('%H:%M:%S', time.gmtime(elapsed))
-            print(f"({infcachename_counter}) ({elapsed_str}) logging {INF_cachename} ...")
-            curr_cache = inf_cachename_lc
-            curr_cache_start = time.time()
-            curr_cache_name = INF_cachename
-            infcachename_counter += 1
-            printed_stats_for_current = False
-
-        cache_out = INF_cachename if unlimited_all else (cachename if cachename is not None else INF_cachename)
-
-        if not (INF_path.lower().endswith('.sdat') or INF_path.lower().endswith('.bar')):
-            continue
+            if self.debug:
+                dbg("Skipping line %d (too few fields): %r", self.line_num, line)
+            return
+        if self.unlimited_all:
+            cache_lc = parts[3].lower()
+            if cache_lc != self.curr_cache:
+                self._end_stretch()
+                self._start_stretch(cache_lc, parts[3])
+            if parts[1].lower().endswith('.sdat'):
+                self.sdat_counts[cache_lc] = self.sdat_counts.get(cache_lc, 0) + 1
+            if self.pool is not None:
+                self.stretch.append((self.line_num, parts))
+                if len(self.stretch) >= STRETCH_CHUNK:
+                    self._submit_chunk(None)
+                return
+        started = time.time()
+        self._write(self.row_func(self.line_num, parts))
+        self.curr_time += time.time() - started
+
+    def close(self):
+        self._end_stretch()
+        if self.pool is not None:
+            self._drain(0)
+            self.pool.shutdown()
+        return self.found
+
+    def _write(self, row):
+        if row is not None:
+            self.out.write(row + '\n')
+            self.found = True
+
+    def _logging_line(self, name):
+        self.counter += 1
+        elapsed = time.time() - self.start_time if self.start_time is not None else 0
+        elapsed_str = time.strftime('%H:%M:%S', time.gmtime(elapsed))
+        self.console(f"({self.counter}) ({elapsed_str}) logging {name} ...")
+
+    def _stats_line(self, name, sdat_count, seconds):
+        self.console(f"({self.counter}) {name} ~ stats : sdats = {sdat_count} / time taken = {format_delta(seconds)}")
+
+    def _start_stretch(self, cache_lc, name):
+        self.curr_cache = cache_lc
+        self.curr_name = name
+        self.curr_time = 0.0
+        self.stretch_first = True
+        if self.pool is None:
+            self._logging_line(name)
+
+    def _end_stretch(self):
+        if self.curr_cache is None:
+            return
+        sdat_count = self.sdat_counts.get(self.curr_cache, 0)
+        if self.pool is None:
+            self._stats_line(self.curr_name, sdat_count, self.curr_time)
+            return
+        self._submit_chunk(sdat_count)
+
+    def _submit_chunk(self, sdat_count):
+        # sdat_count is only known, and only passed, for the last chunk of a stretch
+        future = self.pool.submit(self._stretch_rows, self.stretch)
+        self.pending.append((self.curr_name, self.stretch_first, sdat_count, future))
+        self.stretch = []
+        self.stretch_first = False
+        self._drain(self.jobs)
+
+    def _stretch_rows(self, stretch):
+        started = time.time()
+        rows = [self.row_func(line_num, parts) for line_num, parts in stretch]
+        return rows, time.time() - started
+
+    def _drain(self, keep):
+        # Writes finished stretches from the front, waiting on them while more than keep are queued
+        while self.pending and (len(self.pending) > keep or self.pending[0][3].done()):
+            name, first, sdat_count, future = self.pending.popleft()
+            if first:
+                self._logging_line(name)
+                self.written_time = 0.0
+            rows, seconds = future.result()
+            for row in rows:
+                self._write(row)
+            self.written_time += seconds
+            if sdat_count is not None:
+                self._stats_line(name, sdat_count, self.written_time)
+
+
+def object_row(parts, line_num, cachename, debug, object_cache_folder, sdat_index, unlimited_all, object_cache_missing):
+    # The log row for one INF line's fields, or None when it is not an object SDAT/BAR
+    INF_hash, INF_path, INF_date, INF_cachename = parts[:4]
+    cache_out = INF_cachename if unlimited_all else (cachename if cachename is not None else INF_cachename)
+
+    if not (INF_path.lower().endswith('.sdat') or INF_path.lower().endswith('.bar')):
+        return None
 
-        split_path = split_inf_path(INF_path)
-        is_object, which = find_objects_fields(split_path)
-        if not is_object:
-            continue
-        K, L, M, N, O, P, Q, R, S = split_path
+    split_path = split_inf_path(INF_path)
+    is_object, which = find_objects_fields(split_path)
+    if not is_object:
+        return None
+    K, L, M, N, O, P, Q, R, S = split_path
 
-        if (which == "O" and P.lower() == "objectcatalogue.bar") or (which == "P" and Q.lower() == "objectcatalogue.bar"):
-            if debug:
-                dbg("Ignoring ObjectCatalogue.bar at line %d", line_num)
-            continue
-        if INF_path.lower().endswith('.bar'):
-            version_field = "n/a"
-        elif unlimited_all:
-            if object_cache_folder:
-                sdat_file = find_sdat_file_unlimited(object_cache_folder, INF_cachename, INF_hash, debug)
-            else:
-                sdat_file = None
-            if sdat_file is None:
-                version_field = "n/a"
-            else:
-                size = get_file_size(sdat_file)
-                version_field = get_sdata_version(sdat_file, size)
-        elif cachename is None:
-            version_field = "n/a"
-        elif object_cache_folder is None or object_cache_missing:
-            version_field = "n/a"
-        elif cachename.lower() != INF_cachename.lower():
+    if (which == "O" and P.lower() == "objectcatalogue.bar") or (which == "P" and Q.lower() == "objectcatalogue.bar"):
+        if debug:
+            dbg("Ignoring ObjectCatalogue.bar at line %d", line_num)
+        return None
+    if INF_path.lower().endswith('.bar'):
+        version_field = "n/a"
+    elif unlimited_all:
+        if object_cache_folder:
+            sdat_file = find_sdat_file_unlimited(object_cache_folder, INF_cachename, INF_hash, debug)
+        else:
+            sdat_file = None
+        if sdat_file is None:
             version_field = "n/a"
         else:
-            if sdat_index is not None:
-                sdat_file = find_sdat_file_from_index(sdat_index, INF_hash)
-            else:
-                sdat_file = None
-            if sdat_file is None:
-                version_field = "n/a"
-            else:
-                size = get_file_size(sdat_file)
-                version_field = get_sdata_version(sdat_file, size)
-
-        if which == "O":
-            if M.lower() == 'cds':
-                field4 = L.rstrip('/')
-            elif M.lower() == 'dev':
-                field4 = f"{L.rstrip('/')}.{M.rstrip('/')}"
-            else:
-                field4 = M.rstrip('/')
-            field5 = N.rstrip('/')
-            uuid = P.rstrip('/')
-            fname_wo_ext = get_fname_without_ext(Q)
-            ext = get_ext(Q)
-            txxx = 'T000'
-            if '_' in fname_wo_ext and fname_wo_ext.split('_')[-1].upper().startswith('T'):
-                tpart = fname_wo_ext.split('_')[-1]
-                if tpart[1:].isdigit():
-                    txxx = tpart.upper()
-            sdatname = f"{uuid}_{txxx}"
+            version_field = get_sdata_version(sdat_file)
+    elif cachename is None:
+        version_field = "n/a"
+    elif object_cache_folder is None or object_cache_missing:
+        version_field = "n/a"
+    elif cachename.lower() != INF_cachename.lower():
+        version_field = "n/a"
+    else:
+        if sdat_index is not None:
+            sdat_file = find_sdat_file_from_index(sdat_index, INF_hash)
         else:
-            field4 = f"{L.rstrip('/')}.{N.rstrip('/')}"
-            field5 = O.rstrip('/')
-            uuid = Q.rstrip('/')
-            fname_wo_ext = get_fname_without_ext(R)
-            ext = get_ext(R)
-            txxx = 'T000'
-            if '_' in fname_wo_ext and fname_wo_ext.split('_')[-1].upper().startswith('T'):
-                tpart = fname_wo_ext.split('_')[-1]
-                if tpart[1:].isdigit():
-                    txxx = tpart.upper()
-            sdatname = f"{uuid}_{txxx}"
-
-        log_func('\t'.join([
-            cache_out,
-            INF_hash,
-            INF_date,
-            field4,
-            field5,
-            uuid,
-            fname_wo_ext,
-            ext,
-            version_field,
-            sdatname
-        ]))
-        found = True
-
-    if unlimited_all and curr_cache is not None and curr_cache_start is not None and not printed_stats_for_current:
-        now = time.time()
-        delta = now - curr_cache_start
-        print(f"({infcachename_counter-1}) {curr_cache_name} ~ stats : sdats = {sdat_count_by_cache.get(curr_cache, 0)} / time taken = {format_delta(delta)}")
-
-    return found
-
-
-def process_scenes(
-    lines, log_func, cachename=None, debug=False, scene_cache_folder=None, sdat_index=None,
-    unlimited_all=False, start_time=None
-):
-    import time
-    found = False
-    printed_cachenames = set()
-    infcachename_counter = 1
-
-    def human_time(seconds):
-        seconds = int(seconds)
-        if seconds < 60:
-            return f"{seconds}s"
-        elif seconds < 3600:
-            mins = seconds // 60
-            secs = seconds % 60
-            return f"{mins}m{secs:02d}s"
+            sdat_file = None
+        if sdat_file is None:
+            version_field = "n/a"
         else:
-            hrs = seconds // 3600
-            mins = (seconds % 3600) // 60
-            secs = seconds % 60
-            return f"{hrs}h{mins:02d}m{secs:02d}s"
-
-    sdat_counts = {}
-    for line in lines:
-        parts = line.rstrip('\n').split('|')
-        if len(parts) < 4:
-            continue
-        _, INF_path, _, INF_cachename = parts[:4]
-        if INF_path.lower().endswith('.sdat'):
-            k = INF_cachename.lower()
-            sdat_counts[k] = sdat_counts.get(k, 0) + 1
+            version_field = get_sdata_version(sdat_file)
 
-    scene_cache_missing = scene_cache_folder is not None and not os.path.isdir(
-        scene_cache_folder.split("|")[0] if unlimited_all and "|" in scene_cache_folder else scene_cache_folder
-    )
-
-    cache_lines = []
-    for line in lines:
-        parts = line.rstrip('\n').split('|')
-        cache_lines.append(parts[3].lower() if len(parts) >= 4 else None)
-
-    curr_cache = None
-    curr_cache_start = start_time if start_time is not None else time.time()
-    prev_cache_name = None
-
-    printed_stats_for_current = False
-
-    for idx, (line_num, line) in enumerate(zip(range(1, len(lines)+1), lines)):
-        parts = line.rstrip('\n').split('|')
-        if len(parts) < 4:
-            if debug:
-                dbg("Skipping line %d (too few fields): %r", line_num, line)
-            continue
-        INF_hash, INF_path, INF_date, INF_cachename = parts[:4]
-        inf_cachename_lc = INF_cachename.lower()
-
-        if unlimited_all and inf_cachename_lc != curr_cache:
-            if curr_cache is not None:
-                now = time.time()
-                delta = now - curr_cache_start
-                print(f"({infcachename_counter-1}) {prev_cache_name} ~ stats : sdats = {sdat_counts.get(curr_cache, 0)} / time taken = {human_time(delta)}")
-                printed_stats_for_current = True
-            elapsed = time.time() - start_time if start_time is not None else 0
-            elapsed_str = time.strftime('%H:%M:%S', time.gmtime(elapsed))
-            print(f"({infcachename_counter}) ({elapsed_str}) logging {INF_cachename} ...")
-            curr_cache = inf_cachename_lc
-            curr_cache_start = time.time()
-            prev_cache_name = INF_cachename
-            infcachename_counter += 1
-            printed_stats_for_current = False
-
-        cache_out = INF_cachename if unlimited_all else (cachename if cachename is not None else INF_cachename)
-
-        if not (INF_path.lower().endswith('.sdat') or INF_path.lower().endswith('.bar')):
-            continue
+    if which == "O":
+        if M.lower() == 'cds':
+            field4 = L.rstrip('/')
+        elif M.lower() == 'dev':
+            field4 = f"{L.rstrip('/')}.{M.rstrip('/')}"
+        else:
+            field4 = M.rstrip('/')
+        field5 = N.rstrip('/')
+        uuid = P.rstrip('/')
+        fname_wo_ext = get_fname_without_ext(Q)
+        ext = get_ext(Q)
+        txxx = 'T000'
+        if '_' in fname_wo_ext and fname_wo_ext.split('_')[-1].upper().startswith('T'):
+            tpart = fname_wo_ext.split('_')[-1]
+            if tpart[1:].isdigit():
+                txxx = tpart.upper()
+        sdatname = f"{uuid}_{txxx}"
+    else:
+        field4 = f"{L.rstrip('/')}.{N.rstrip('/')}"
+        field5 = O.rstrip('/')
+        uuid = Q.rstrip('/')
+        fname_wo_ext = get_fname_without_ext(R)
+        ext = get_ext(R)
+        txxx = 'T000'
+        if '_' in fname_wo_ext and fname_wo_ext.split('_')[-1].upper().startswith('T'):
+            tpart = fname_wo_ext.split('_')[-1]
+            if tpart[1:].isdigit():
+                txxx = tpart.upper()
+        sdatname = f"{uuid}_{txxx}"
+
+    return '\t'.join([
+        cache_out,
+        INF_hash,
+        INF_date,
+        field4,
+        field5,
+        uuid,
+        fname_wo_ext,
+        ext,
+        version_field,
+        sdatname
+    ])
+
+
+def scene_row(parts, line_num, cachename, debug, scene_cache_folder, sdat_index, unlimited_all, scene_cache_missing):
+    # The log row for one INF line's fields, or None when it is not a scene SDAT/BAR
+    INF_hash, INF_path, INF_date, INF_cachename = parts[:4]
+    cache_out = INF_cachename if unlimited_all else (cachename if cachename is not None else INF_cachename)
+
+    if not (INF_path.lower().endswith('.sdat') or INF_path.lower().endswith('.bar')):
+        return None
 
-        split_path = split_inf_path(INF_path)
-        is_scene, which = find_scenes_fields(split_path)
-        if not is_scene:
-            continue
+    split_path = split_inf_path(INF_path)
+    is_scene, which = find_scenes_fields(split_path)
+    if not is_scene:
+        return None
 
-        K, L, M, N, O, P, Q, R, S = split_path
+    K, L, M, N, O, P, Q, R, S = split_path
 
-        if INF_path.lower().endswith('.bar'):
-            version_field = "n/a"
-        elif unlimited_all:
-            if scene_cache_folder:
-                sdat_file = find_sdat_file_unlimited(scene_cache_folder, INF_cachename, INF_hash, debug)
-            else:
-                sdat_file = None
-            if sdat_file is None:
-                version_field = "n/a"
-            else:
-                size = get_file_size(sdat_file)
-                version_field = get_sdata_version(sdat_file, size)
-        elif cachename is None:
-            version_field = "n/a"
-        elif scene_cache_folder is None or scene_cache_missing:
+    if INF_path.lower().endswith('.bar'):
+        version_field = "n/a"
+    elif unlimited_all:
+        if scene_cache_folder:
+            sdat_file = find_sdat_file_unlimited(scene_cache_folder, INF_cachename, INF_hash, debug)
+        else:
+            sdat_file = None
+        if sdat_file is None:
             version_field = "n/a"
-        elif cachename.lower() != INF_cachename.lower():
+        else:
+            version_field = get_sdata_version(sdat_file)
+    elif cachename is None:
+        version_field = "n/a"
+    elif scene_cache_folder is None or scene_cache_missing:
+        version_field = "n/a"
+    elif cachename.lower() != INF_cachename.lower():
+        version_field = "n/a"
+    else:
+        if sdat_index is not None:
+            sdat_file = find_sdat_file_from_index(sdat_index, INF_hash)
+        else:
+            sdat_file = None
+        if sdat_file is None:
             version_field = "n/a"
         else:
-            if sdat_index is not None:
-                sdat_file = find_sdat_file_from_index(sdat_index, INF_hash)
-            else:
-                sdat_file = None
-            if sdat_file is None:
-                version_field = "n/a"
-            else:
-                size = get_file_size(sdat_file)
-                version_field = get_sdata_version(sdat_file, size)
-
-        if which == "O":
-            if M.lower() == 'cds':
-                field4 = L.rstrip('/')
-            elif M.lower() == 'dev':
-                field4 = f"{L.rstrip('/')}.{M.rstrip('/')}"
-            else:
-                field4 = M.rstrip('/')
-            field5 = N.rstrip('/')
-            scene = P.rstrip('/')
-            fname_wo_ext = get_fname_without_ext(Q)
-            ext = get_ext(Q)
-            sdatname = f"{scene}${fname_wo_ext}"
+            version_field = get_sdata_version(sdat_file)
+
+    if which == "O":
+        if M.lower() == 'cds':
+            field4 = L.rstrip('/')
+        elif M.lower() == 'dev':
+            field4 = f"{L.rstrip('/')}.{M.rstrip('/')}"
         else:
-            field4 = f"{L.rstrip('/')}.{N.rstrip('/')}"
-            field5 = O.rstrip('/')
-            scene = Q.rstrip('/')
-            fname_wo_ext = get_fname_without_ext(R)
-            ext = get_ext(R)
-            sdatname = f"{scene}${fname_wo_ext}"
-
-        log_func('\t'.join([
-            cache_out,
-            INF_hash,
-            INF_date,
-            field4,
-            field5,
-            scene,
-            fname_wo_ext,
-            ext,
-            version_field,
-            sdatname
-        ]))
-        found = True
-
-    if unlimited_all and curr_cache is not None and curr_cache_start is not None and not printed_stats_for_current:
-        now = time.time()
-        delta = now - curr_cache_start
-        print(f"({infcachename_counter-1}) {prev_cache_name} ~ stats : sdats = {sdat_counts.get(curr_cache, 0)} / time taken = {human_time(delta)}")
-
-    return found
+            field4 = M.rstrip('/')
+        field5 = N.rstrip('/')
+        scene = P.rstrip('/')
+        fname_wo_ext = get_fname_without_ext(Q)
+        ext = get_ext(Q)
+        sdatname = f"{scene}${fname_wo_ext}"
+    else:
+        field4 = f"{L.rstrip('/')}.{N.rstrip('/')}"
+        field5 = O.rstrip('/')
+        scene = Q.rstrip('/')
+        fname_wo_ext = get_fname_without_ext(R)
+        ext = get_ext(R)
+        sdatname = f"{scene}${fname_wo_ext}"
+
+    return '\t'.join([
+        cache_out,
+        INF_hash,
+        INF_date,
+        field4,
+        field5,
+        scene,
+        fname_wo_ext,
+        ext,
+        version_field,
+        sdatname
+    ])
 
 
 def main():
@@ -483,6 +458,8 @@ def main():
         "[--objects <literalpath>/<rootdir|substr>] "
         "[--scenes <literalpath>/<rootdir|substr>] "
         "[--unlimited_all] "
+        "[--jobs <n>] "
+        "[--reindex] "
         "[--debug]"
     )
     if len(sys.argv) < 3:
@@ -509,6 +486,8 @@ def main():
     process_objects_flag = False
     process_scenes_flag = False
     debug = False
+    reindex = False
+    jobs = 1
 
     while idx < len(args):
         if args[idx] == '--objects':
@@ -533,6 +512,20 @@ def main():
         elif args[idx] == '--debug':
             debug = True
             idx += 1
+        elif args[idx] == '--jobs':
+            # Only used with --unlimited_all, where there are several caches to spread out
+            try:
+                jobs = int(args[idx + 1])
+            except (IndexError, ValueError):
+                print("ERROR: --jobs requires a number.")
+                sys.exit(1)
+            if jobs < 1:
+                print("ERROR: --jobs must be at least 1.")
+                sys.exit(1)
+            idx += 2
+        elif args[idx] == '--reindex':
+            reindex = True
+            idx += 1
         else:
             print(f"ERROR: Unrecognized flag '{args[idx]}'\n{usage}")
             sys.exit(1)
@@ -545,56 +538,95 @@ def main():
         print(f"Input file {inf_file} does not exist")
         sys.exit(1)
 
-    with open(inf_file, 'r', encoding='utf-8') as f:
-        all_lines = f.readlines()
-
-    object_lines = [l for l in all_lines if '/objects/' in l.lower()]
-    scene_lines  = [l for l in all_lines if '/scenes/' in l.lower()]
-
     sdat_index_objects = None
     sdat_index_scenes = None
 
     if not unlimited_all:
+        # Directory listings are kept next to the log file, shared by the objects and scenes runs
+        sidecar = SdatIndexSidecar(os.path.join(os.path.dirname(os.path.abspath(log_file)), SIDECAR_NAME), invalidate=reindex)
         if process_objects_flag and object_cache_folder:
-            sdat_index_objects = build_sdat_index(object_cache_folder)
+            sdat_index_objects = build_sdat_index(object_cache_folder, sidecar)
         if process_scenes_flag and scene_cache_folder:
-            sdat_index_scenes = build_sdat_index(scene_cache_folder)
+            sdat_index_scenes = build_sdat_index(scene_cache_folder, sidecar)
+        sidecar.save()
     else:
         if debug:
             dbg("Unlimited_all mode active. objects=%r scenes=%r", object_cache_folder, scene_cache_folder)
+        index_unlimited_folders([
+            object_cache_folder if process_objects_flag else None,
+            scene_cache_folder if process_scenes_flag else None
+        ], debug)
 
-    any_logged = False
-    output_lines = []
-    def cache_log(x):
-        output_lines.append(x)
+    object_cache_missing = object_cache_folder is not None and not os.path.isdir(
+        object_cache_folder.split("|")[0] if unlimited_all and "|" in object_cache_folder else object_cache_folder
+    )
+    scene_cache_missing = scene_cache_folder is not None and not os.path.isdir(
+        scene_cache_folder.split("|")[0] if unlimited_all and "|" in scene_cache_folder else scene_cache_folder
+    )
 
     start_time = time.time()
 
-    if process_objects_flag:
-        found_obj = process_objects(
-            object_lines, cache_log, cachename=cachename, debug=debug,
-            object_cache_folder=object_cache_folder, sdat_index=sdat_index_objects,
-            unlimited_all=unlimited_all, start_time=start_time
-        )
-        any_logged = any_logged or found_obj
-
-    if process_scenes_flag:
-        found_scn = process_scenes(
-            scene_lines, cache_log, cachename=cachename, debug=debug,
-            scene_cache_folder=scene_cache_folder, sdat_index=sdat_index_scenes,
-            unlimited_all=unlimited_all, start_time=start_time
-        )
-        any_logged = any_logged or found_scn
-
-    if any_logged:
-        with open(log_file, 'w', encoding='utf-8') as f_out:
-            for out_line in output_lines:
-                f_out.write(out_line + '\n')
-        if debug:
-            dbg("Log file created: %s", log_file)
-    else:
-        if debug:
-            dbg("No .sdat/.bar objects or scenes found; no log file created.")
+    # One pass over the INF log: object rows go straight into the log file, scene rows
+    # into a spill file appended after them, so rows keep their objects-then-scenes order.
+    # Scene progress lines are spilled too and printed after the object ones for the same
+    # reason. Whatever goes wrong, no temporary file is left next to the log.
+    tmp_log = f"{log_file}.tmp"
+    spill_path = f"{log_file}.scenes.tmp"
+    console_path = f"{log_file}.console.tmp"
+    any_logged = False
+    try:
+        with open(tmp_log, 'w', encoding='utf-8') as f_out, \
+                open(spill_path, 'w+', encoding='utf-8') as f_spill, \
+                open(console_path, 'w+', encoding='utf-8') as f_console:
+            objects = scenes = None
+            if process_objects_flag:
+                objects = RowEmitter(
+                    lambda line_num, parts: object_row(
+                        parts, line_num, cachename, debug, object_cache_folder, sdat_index_objects,
+                        unlimited_all, object_cache_missing
+                    ),
+                    f_out, unlimited_all=unlimited_all, start_time=start_time, jobs=jobs, debug=debug
+                )
+            if process_scenes_flag:
+                scenes = RowEmitter(
+                    lambda line_num, parts: scene_row(
+                        parts, line_num, cachename, debug, scene_cache_folder, sdat_index_scenes,
+                        unlimited_all, scene_cache_missing
+                    ),
+                    f_spill, unlimited_all=unlimited_all, start_time=start_time, jobs=jobs,
+                    console=lambda message: f_console.write(message + '\n'), debug=debug
+                )
+
+            with open(inf_file, 'r', encoding='utf-8') as f_in:
+                for line in f_in:
+                    line_lc = line.lower()
+                    if objects is not None and '/objects/' in line_lc:
+                        objects.feed(line)
+                    if scenes is not None and '/scenes/' in line_lc:
+                        scenes.feed(line)
+
+            if objects is not None:
+                any_logged = objects.close() or any_logged
+            if scenes is not None:
+                any_logged = scenes.close() or any_logged
+                f_spill.seek(0)
+                shutil.copyfileobj(f_spill, f_out)
+                f_console.seek(0)
+                for message in f_console:
+                    print(message, end='')
+
+        if any_logged:
+            os.replace(tmp_log, log_file)
+            if debug:
+                dbg("Log file created: %s", log_file)
+        else:
+            os.remove(tmp_log)
+            if debug:
+                dbg("No .sdat/.bar objects or scenes found; no log file created.")
+    finally:
+        for path in (spill_path, console_path, tmp_log):
+            if os.path.exists(path):
+                os.remove(path)
 
 if __name__ == "__main__":
     try:
@@ -1,9 +1,14 @@
 import sys
 import re
 
-REGIONS = [
+REGIONS = {
     "en-US", "en-GB", "fr-FR", "ja-JP", "ko-KR", "it-IT", "es-ES", "de-DE", "zh-TW", "zh-HK", "en-SG"
-]
+}
+
+BLACKLIST_PREFIXES = (
+    "gp1.wac.edgecastcdn.net",
+    "www.outso-srv1.com",
+)
 
 SCENE_PATTERNS = [
     (r'^Cinema$',                       r'(?i)^large_en-us_T(?P<tval>\d+)\.png$',              r'Cinema_T{tval}L-SCEA.png'),
@@ -88,6 +93,20 @@ SCENE_PATTERNS = [
     (r'^jcinema_auditorium_2$',         r'^large_ja-JP_T(?P<tval>\d+)\.png$',                  r'jcinema_auditorium_2_T{tval}L.png'),
 ]
 
+def index_scene_patterns(patterns):
+    # Every scene pattern is an anchored literal (^name$), so the file patterns are looked
+    # up by exact scene name instead of trying them all. Compiled once, and kept in their
+    # SCENE_PATTERNS order so the first match for a scene still wins.
+    index = {}
+    for scene_pat, file_pat, result_template in patterns:
+        scene_name = scene_pat[1:-1]
+        if not (scene_pat.startswith('^') and scene_pat.endswith('$')) or re.escape(scene_name) != scene_name:
+            raise ValueError(f"scene pattern is not an anchored literal: {scene_pat!r}")
+        index.setdefault(scene_name, []).append((re.compile(file_pat), result_template))
+    return index
+
+SCENE_FILE_PATTERNS = index_scene_patterns(SCENE_PATTERNS)
+
 DEBUG_LOG_FILE = "tmp.log"
 debug_scenes = False
 debug_objects = False
@@ -132,11 +151,7 @@ def build_thumb(E, F, G, H):
     fields += [""] * (8 - len(fields))
     K, L, M, N, O, P, Q, R = fields[:8]
 
-    BLACKLIST_PREFIXES = [
-        "gp1.wac.edgecastcdn.net",
-        "www.outso-srv1.com",
-    ]
-    if any(F.startswith(prefix) for prefix in BLACKLIST_PREFIXES):
+    if F.startswith(BLACKLIST_PREFIXES):
         return None
 
     is_scene = O.lower() == "scenes" or P.lower() == "scenes"
@@ -151,11 +166,9 @@ def build_thumb(E, F, G, H):
 
     # --- REGEX MATCH LOGIC ---
     if is_scene:
-        for scene_pat, file_pat, result_template in SCENE_PATTERNS:
-            scene_match = re.match(scene_pat, scene_name)
-            file_match = re.match(file_pat, filename)
-            if scene_match and file_match:
-                m = file_match
+        for file_re, result_template in SCENE_FILE_PATTERNS.get(scene_name, ()):
+            m = file_re.match(filename)
+            if m:
                 matched_result = result_template.format(**m.groupdict())
                 if debug_scenes:
                     if P.lower() == "scenes":
@@ -175,10 +188,8 @@ def build_thumb(E, F, G, H):
     region_tag = None
     if "_" in filename:
         region_prefix = filename.split("_", 1)[0]
-        for region in REGIONS:
-            if region_prefix == region:
-                region_tag = region
-                break
+        if region_prefix in REGIONS:
+            region_tag = region_prefix
 
     # -- LEFT-HAND PREFIX LOGIC --
     if O.lower() in ("scenes", "objects"):
@@ -0,0 +1,38 @@
+import atexit
+import time
+
+FLUSH_BYTES = 1024 * 1024
+FLUSH_SECONDS = 5.0
+
+class RunLogWriter:
+    # Keeps every run log (dupes, nofiles, override) open in append mode with a large
+    # buffer. The buffer is written out when it fills, every FLUSH_SECONDS, on close
+    # and at interpreter exit, which also covers runs that die on an exception.
+
+    def __init__(self, flush_bytes=FLUSH_BYTES, flush_seconds=FLUSH_SECONDS):
+        self.flush_bytes = flush_bytes
+        self.flush_seconds = flush_seconds
+        self.handles = {}
+        self.last_flush = time.monotonic()
+        atexit.register(self.close)
+
+    def write(self, path, text):
+        handle = self.handles.get(path)
+        if handle is None:
+            handle = open(path, 'a', encoding='utf-8', errors='ignore', buffering=self.flush_bytes)
+            self.handles[path] = handle
+        handle.write(text)
+        if time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        for handle in self.handles.values():
+            handle.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self, path=None):
+        paths = [path] if path is not None else list(self.handles)
+        for p in paths:
+            handle = self.handles.pop(p, None)
+            if handle is not None:
+                handle.close()
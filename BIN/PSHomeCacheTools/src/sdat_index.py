@@ -0,0 +1,116 @@
+import json
+import os
+import time
+from pathlib import Path
+
+SIDECAR_NAME = "sdat_index.json"
+SIDECAR_VERSION = 1
+SDAT_SUFFIX = os.path.normcase(".sdat")
+# A directory changed this close to its listing may change again within the same mtime
+# tick, so its listing is kept for this run only and taken again next time
+MTIME_SLACK_NS = 2 * 1000 * 1000 * 1000
+
+def list_sdat_dir(dirpath):
+    # (SDAT file names, subdirectory names) of one directory in scandir order, as
+    # Path.rglob("*.sdat") sees them; symlinked directories are not descended into
+    with os.scandir(dirpath) as it:
+        entries = list(it)
+    files = []
+    subdirs = []
+    for entry in entries:
+        try:
+            if os.path.normcase(entry.name).endswith(SDAT_SUFFIX) and "_dat" in entry.name.lower() and entry.is_file():
+                files.append(entry.name)
+            if entry.is_dir() and not entry.is_symlink():
+                subdirs.append(entry.name)
+        except OSError:
+            continue
+    return files, subdirs
+
+class SdatIndexSidecar:
+    # Directory listings behind build_sdat_index(), kept in a JSON file between runs. A
+    # directory is only listed again when its mtime changed, every other one costs a stat.
+    # Listings are kept per search root; directories no longer reached are dropped on save.
+
+    def __init__(self, path, invalidate=False):
+        self.path = str(path)
+        self.roots = {}
+        self.changed = False
+        if not invalidate:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == SIDECAR_VERSION:
+                    self.roots = data.get('roots', {})
+            except (OSError, ValueError, AttributeError):
+                self.roots = {}
+        self.seen = {}
+
+    def _root_key(self, search_root):
+        return os.path.normcase(os.path.abspath(str(search_root)))
+
+    def listing(self, search_root, dirpath):
+        root_key = self._root_key(search_root)
+        stored = self.roots.get(root_key, {})
+        seen = self.seen.setdefault(root_key, {})
+        key = os.path.normcase(os.path.relpath(dirpath, str(search_root)))
+        entry = seen.get(key)
+        if entry is not None:
+            return entry[1], entry[2]
+        try:
+            mtime_ns = os.stat(dirpath).st_mtime_ns
+        except OSError:
+            return None
+        entry = stored.get(key)
+        if entry is not None and entry[0] == mtime_ns:
+            seen[key] = entry
+            return entry[1], entry[2]
+        try:
+            files, subdirs = list_sdat_dir(dirpath)
+        except OSError:
+            return None
+        if time.time_ns() - mtime_ns < MTIME_SLACK_NS:
+            mtime_ns = None
+        seen[key] = [mtime_ns, files, subdirs]
+        self.changed = True
+        return files, subdirs
+
+    def save(self):
+        for root_key, seen in self.seen.items():
+            if len(seen) != len(self.roots.get(root_key, ())):
+                self.changed = True
+            self.roots[root_key] = seen
+        self.seen = {}
+        if not self.changed:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': SIDECAR_VERSION, 'roots': self.roots}, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+            self.changed = False
+        except OSError:
+            pass
+
+def build_sdat_index(search_root, sidecar=None):
+    # hash -> [paths of "<hash>_DAT*.sdat" files], in the order Path.rglob("*.sdat")
+    # finds them: files of a directory first, then each subdirectory in scandir order
+    index = {}
+    root = str(Path(search_root))
+    stack = [root]
+    while stack:
+        dirpath = stack.pop()
+        if sidecar is not None:
+            listing = sidecar.listing(root, dirpath)
+        else:
+            try:
+                listing = list_sdat_dir(dirpath)
+            except OSError:
+                listing = None
+        if listing is None:
+            continue
+        files, subdirs = listing
+        for name in files:
+            index.setdefault(name.lower().split('_')[0], []).append(os.path.join(dirpath, name))
+        stack.extend(os.path.join(dirpath, name) for name in reversed(subdirs))
+    return index
@@ -3,13 +3,13 @@ import os
 import sys
 
 build_exe_options = {
-    "packages": ["os", "sys", "hashlib", "PIL", "subprocess", "logging", "re", "shutil", "datetime", "pathlib"],
+    "packages": ["os", "sys", "hashlib", "PIL", "subprocess", "logging", "re", "shutil", "datetime", "pathlib", "concurrent", "multiprocessing"],
     "excludes": [
         "tkinter", "unittest", "email", "email.mime", "email.header", "email.charset", "email.contentmanager",
         "email.errors", "email.feedparser", "email.generator", "email.iterators", "email.message",
         "email.parser", "email.policy", "email.utils", "email.base64mime", "email.encoders",
         "email._parseaddr", "email.quoprimime", "email._header_value_parser", "email._encoded_words",
-        "html", "http", "xml", "pydoc", "test", "asyncio", "concurrent", "ctypes"
+        "html", "http", "xml", "pydoc", "test", "asyncio", "ctypes"
     ],
     "include_files": [],
     "optimize": 2
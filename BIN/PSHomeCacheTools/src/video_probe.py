@@ -0,0 +1,155 @@
+import os
+import struct
+import subprocess
+
+VIDEO_PROBE_MODES = ("full", "triage")
+# Only the triage passes are bounded by default; a full pass runs as long as it takes
+TRIAGE_VIDEO_TIMEOUT = 300
+TIMEOUT_VERDICT = "TIMEOUT"
+
+FULL_ENTRIES = ['-show_entries', 'format', '-show_entries', 'stream', '-show_entries', 'frame']
+TRIAGE_ENTRIES = ['-show_entries', 'format', '-show_entries', 'stream']
+
+# Boxes on the way from moov to a track's sample table; everything else inside moov is skipped
+CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf'}
+MAX_MOOV_SIZE = 64 * 1024 * 1024
+BOX_CHECK_TAG = "[mp4 box check]"
+
+def read_box_header(data, pos, end, box_end=None):
+    # (type, header size, box size) of the box at pos, or None if the header is cut short.
+    # A size 0 box runs to box_end, the end of its parent or of the file (default end)
+    if end - pos < 8:
+        return None
+    size, box_type = struct.unpack_from(">I4s", data, pos)
+    header = 8
+    if size == 1:
+        if end - pos < 16:
+            return None
+        size = struct.unpack_from(">Q", data, pos + 8)[0]
+        header = 16
+    elif size == 0:
+        size = (end if box_end is None else box_end) - pos
+    return box_type, header, size
+
+def read_top_level_boxes(f, file_size):
+    boxes = []
+    pos = 0
+    while pos < file_size:
+        f.seek(pos)
+        head = f.read(min(16, file_size - pos))
+        parsed = read_box_header(head, 0, len(head), file_size - pos)
+        if parsed is None:
+            return boxes, f"partial file: box header at offset {pos} is cut short"
+        box_type, header, size = parsed
+        if size < header:
+            return boxes, f"invalid box size {size} at offset {pos}"
+        if pos + size > file_size:
+            return boxes, f"partial file: '{box_type.decode('latin-1')}' box at offset {pos} needs {pos + size} bytes, file has {file_size}"
+        boxes.append((box_type, pos, header, size))
+        pos += size
+    return boxes, None
+
+def iter_child_boxes(data, pos, end):
+    while pos < end:
+        parsed = read_box_header(data, pos, end)
+        if parsed is None or parsed[2] < parsed[1] or pos + parsed[2] > end:
+            raise ValueError("bad box inside moov")
+        box_type, header, size = parsed
+        yield box_type, pos + header, pos + size
+        pos += size
+
+def iter_sample_tables(data, pos, end):
+    # Yields {type: payload} of the stco/co64/stsc boxes of every track's stbl
+    for box_type, start, stop in iter_child_boxes(data, pos, end):
+        if box_type in CONTAINER_BOXES:
+            yield from iter_sample_tables(data, start, stop)
+        elif box_type == b'stbl':
+            yield {
+                child: data[child_start:child_stop]
+                for child, child_start, child_stop in iter_child_boxes(data, start, stop)
+                if child in (b'stco', b'co64', b'stsc')
+            }
+
+def parse_table(box_type, payload):
+    # Full box: version/flags, entry count, then the entries
+    count = struct.unpack_from(">I", payload, 4)[0]
+    if box_type == b'stco':
+        return struct.unpack_from(f">{count}I", payload, 8)
+    if box_type == b'co64':
+        return struct.unpack_from(f">{count}Q", payload, 8)
+    return [struct.unpack_from(">I", payload, 8 + i * 12)[0] for i in range(count)]
+
+def check_mp4_boxes(file_path):
+    # Structural check of an ISO-BMFF file without decoding anything. Returns a list of
+    # error lines worded like ffprobe's (empty when the structure is sound), or None when
+    # the file is something this walker can't judge, e.g. fragmented or not ISO-BMFF at all.
+    try:
+        file_size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as f:
+            boxes, error = read_top_level_boxes(f, file_size)
+            types = [box[0] for box in boxes]
+            if error:
+                # Junk after a complete moov and mdat is left for ffprobe to judge
+                if not boxes or boxes[0][0] != b'ftyp' or (b'moov' in types and b'mdat' in types):
+                    return None
+                return [f"{BOX_CHECK_TAG} {error}"]
+            if not types or types[0] not in (b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide'):
+                return None
+            if b'moof' in types:
+                return None
+            if b'moov' not in types:
+                return [f"{BOX_CHECK_TAG} moov atom not found"]
+
+            _, moov_pos, moov_header, moov_size = boxes[types.index(b'moov')]
+            if moov_size > MAX_MOOV_SIZE:
+                return None
+            f.seek(moov_pos)
+            moov = f.read(moov_size)
+    except OSError:
+        return None
+
+    mdats = [(pos + header, pos + size) for box_type, pos, header, size in boxes if box_type == b'mdat']
+    errors = []
+    try:
+        for tables in iter_sample_tables(moov, moov_header, moov_size):
+            offset_type = b'co64' if b'co64' in tables else b'stco'
+            if offset_type not in tables:
+                continue
+            offsets = parse_table(offset_type, tables[offset_type])
+            for offset in offsets:
+                if not any(start <= offset < end for start, end in mdats):
+                    errors.append(f"{BOX_CHECK_TAG} invalid chunk offset {offset} outside mdat")
+                    break
+            if b'stsc' in tables and any(first > len(offsets) for first in parse_table(b'stsc', tables[b'stsc'])):
+                errors.append(f"{BOX_CHECK_TAG} contradictory STSC and STCO")
+    except (ValueError, struct.error):
+        return None
+    return errors
+
+def default_video_timeout(mode):
+    return TRIAGE_VIDEO_TIMEOUT if mode == "triage" else None
+
+def run_ffprobe(ffprobe_path, file_path, entries, timeout):
+    # Only the error output is used, the JSON (one entry per frame) is thrown away unread
+    cmd = [ffprobe_path, '-v', 'error', *entries, '-print_format', 'json', file_path]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=timeout)
+    return result.stderr
+
+def probe_video(file_path, ffprobe_path, mode="full", timeout=None):
+    # Returns ffprobe's error output, or None when a pass ran longer than timeout seconds
+    # (None = no limit).
+    # "triage" first walks the MP4 boxes in Python and only spawns ffprobe when the walker
+    # can't judge the file; then it reads just the container and stream headers and repeats
+    # with full frame inspection when that pass already reports something.
+    if mode == "triage":
+        box_errors = check_mp4_boxes(file_path)
+        if box_errors is not None:
+            return "\n".join(box_errors)
+    try:
+        if mode == "triage":
+            stderr = run_ffprobe(ffprobe_path, file_path, TRIAGE_ENTRIES, timeout)
+            if not stderr.strip():
+                return stderr
+        return run_ffprobe(ffprobe_path, file_path, FULL_ENTRIES, timeout)
+    except subprocess.TimeoutExpired:
+        return None
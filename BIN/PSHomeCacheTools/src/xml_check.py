@@ -0,0 +1,67 @@
+import re
+
+ROOT_TAGS = [
+    "commerce_point", "XML", "xml", "REGIONINFO", "rss", "RSS", "LOCALISATION",
+    "eula", "active_objects", "videos", "media", "WEATHER", "TICKER"
+]
+
+# Root tags in the order they are judged, case-insensitive duplicates dropped
+ROOT_TAG_ORDER = list(dict.fromkeys(tag.lower() for tag in ROOT_TAGS))
+XML_CHUNK = 256 * 1024
+
+_root_tag_patterns = {}
+
+def root_tag_pattern(count):
+    # One lookahead at every '<' finds a close or open tag of the first count roots in
+    # ROOT_TAG_ORDER; being zero-width it also sees tags nested inside a malformed tag.
+    # Matched against lowercased text, like the per-tag patterns it replaces.
+    pattern = _root_tag_patterns.get(count)
+    if pattern is None:
+        names = "|".join(ROOT_TAG_ORDER[:count])
+        pattern = re.compile(rf"<(?=/\s*(?P<close>{names})\s*>|\s*(?P<open>{names})\b(?P<attrs>[^>]*)>)")
+        _root_tag_patterns[count] = pattern
+    return pattern
+
+def xml_verdict(seen):
+    # The first root tag in ROOT_TAG_ORDER that was opened decides: self-closing or also
+    # closed somewhere is fine, opened only is corrupt. Returns (verdict, rank of the
+    # deciding tag or None); only tags ranked up to that one can still change the verdict.
+    for rank, tag in enumerate(ROOT_TAG_ORDER):
+        flags = seen.get(tag, ())
+        if 'self_close' in flags or ('open' in flags and 'close' in flags):
+            return 0, rank
+        if 'open' in flags:
+            return 1, rank
+    return 0, None
+
+def is_xml_corrupt(filepath):
+    # Reads the file in chunks and only lowercases one chunk at a time. Every match runs
+    # from a '<' to the first '>' after it, so only the text after the last '>' of a chunk
+    # is carried over into the next one. Stops once the first root tag is settled.
+    try:
+        seen = {}
+        carry = ""
+        pattern = root_tag_pattern(len(ROOT_TAG_ORDER))
+        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+            while chunk := f.read(XML_CHUNK):
+                text = carry + chunk.lower()
+                complete = text.rfind('>') + 1
+                tail = text[complete:]
+                start = tail.find('<')
+                carry = tail[start:] if start >= 0 else ""
+                for match in pattern.finditer(text, 0, complete):
+                    if match.group('close'):
+                        seen.setdefault(match.group('close'), set()).add('close')
+                    else:
+                        flags = seen.setdefault(match.group('open'), set())
+                        flags.add('open')
+                        if match.group('attrs').rstrip().endswith('/'):
+                            flags.add('self_close')
+                verdict, rank = xml_verdict(seen)
+                if rank == 0 and verdict == 0:
+                    return verdict
+                if rank is not None:
+                    pattern = root_tag_pattern(rank + 1)
+        return xml_verdict(seen)[0]
+    except Exception:
+        return 1
@@ -0,0 +1,50 @@
+import os
+import struct
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from video_probe import BOX_CHECK_TAG, check_mp4_boxes
+
+def box(box_type, payload=b"", size=None):
+    return struct.pack(">I4s", len(payload) + 8 if size is None else size, box_type) + payload
+
+def ftyp():
+    return box(b'ftyp', b'isom' + struct.pack(">I", 512) + b'isomiso2avc1mp41')
+
+def moov(chunk_offset):
+    stco = box(b'stco', struct.pack(">III", 0, 1, chunk_offset))
+    stsc = box(b'stsc', struct.pack(">IIIII", 0, 1, 1, 1, 1))
+    stbl = box(b'stbl', stco + stsc)
+    return box(b'moov', box(b'trak', box(b'mdia', box(b'minf', stbl))))
+
+class CheckMp4BoxesTest(unittest.TestCase):
+
+    def check(self, data):
+        fd, path = tempfile.mkstemp(suffix=".mp4")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            return check_mp4_boxes(path)
+        finally:
+            os.remove(path)
+
+    def test_size_zero_mdat_without_moov(self):
+        # The mdat payload must not be parsed as further boxes
+        data = ftyp() + box(b'mdat', b'\xff' * 64, size=0)
+        self.assertEqual(self.check(data), [f"{BOX_CHECK_TAG} moov atom not found"])
+
+    def test_size_zero_trailing_mdat(self):
+        head = ftyp()
+        mdat_payload = len(head) + len(moov(0)) + 8
+        data = head + moov(mdat_payload) + box(b'mdat', b'\xff' * 64, size=0)
+        self.assertEqual(self.check(data), [])
+
+    def test_size_zero_mdat_offset_past_end(self):
+        data = ftyp() + moov(10 ** 6) + box(b'mdat', b'\xff' * 64, size=0)
+        self.assertEqual(self.check(data), [f"{BOX_CHECK_TAG} invalid chunk offset 1000000 outside mdat"])
+
+if __name__ == '__main__':
+    unittest.main()